@@ -1,19 +1,54 @@
+import hashlib
 import heapq
+from bisect import bisect_left
 import json
 import sqlite3
 from dataclasses import dataclass, asdict
+from types import MappingProxyType
 from typing import List, Dict, Set, Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
 from enum import Enum
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as URLLib3Error
+from urllib3.util.retry import Retry
 from datetime import datetime
 import math
 import os
+import random
+import re
+import threading
+import time
 import shutil
+from argon2 import PasswordHasher, extract_parameters
+from argon2.exceptions import Argon2Error, InvalidHashError
+from werkzeug.security import check_password_hash
 import geopandas as gpd
+import numpy as np
 import osmnx as ox
+from shapely.geometry import Point, Polygon
+from shapely.strtree import STRtree
 # import folium  # Replaced with OpenLayers
 import matplotlib.colors as mcolors
 
+try:
+    from numba import njit
+except ImportError:  # numba не обязательна: без неё проверки районов идут на чистом Python
+    njit = None
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # scipy тоже не обязательна: ближайшие вершины маршрута ищутся через NumPy
+    cKDTree = None
+try:
+    import ijson
+except ImportError:  # без ijson ответ Overpass разбирается целиком через response.json()
+    ijson = None
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 def draw_tula_districts_robust():
     print("Загружаю границы районов Тулы через поиск административных единиц...")
 
@@ -276,10 +311,10 @@ def get_tula_districts_from_osm():
         return {}
 
     districts = {}
-    gdf = gdf.reset_index()
-    for idx, row in gdf.iterrows():
-        district_name = row.get('name', f"Район {idx}")
-        geom = row.geometry
+    # Колонки как массивы: без сборки pandas Series на каждую строку, как в iterrows()
+    names = gdf['name'].to_numpy() if 'name' in gdf.columns else [None] * len(gdf)
+    for idx, (name, geom) in enumerate(zip(names, gdf.geometry.to_numpy())):
+        district_name = name if isinstance(name, str) else f"Район {idx}"
         if geom.geom_type == 'Polygon':
             coords = list(geom.exterior.coords)
             districts[district_name] = coords
@@ -290,6 +325,75 @@ def get_tula_districts_from_osm():
     return districts
 
 
+# Границы из OSM, сохранённые после первой успешной загрузки: следующие запуски
+# (воркеры, скрипты) читают файл вместо запроса к Overpass. Удалите файл, чтобы обновить
+DISTRICTS_CACHE_PATH = "db/tula_districts.json"
+
+
+def load_tula_districts(cache_path: str = DISTRICTS_CACHE_PATH):
+    """Границы районов из файла-кэша, а при его отсутствии — из OSM с сохранением в файл"""
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+    districts = get_tula_districts_from_osm()
+    if districts:
+        # Пустой результат (ошибка запроса) не сохраняем — попробуем снова при следующем запуске
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump(districts, f, ensure_ascii=False)
+    return districts
+
+
+
+
+# Очистка адресов из Nominatim: индекс, страна и длинные названия регионов
+POSTAL_RE = re.compile(r'^\d{5,}$')
+COUNTRY_SET = frozenset(['россия', 'russia'])
+REGION_WORDS = re.compile(r'область|край|республика')
+
+# Пароли админов хэшируются Argon2id; старые хэши werkzeug (pbkdf2/scrypt) ещё проверяются
+# и при входе переводятся на Argon2
+PASSWORD_HASHER = PasswordHasher(time_cost=2, memory_cost=19 * 1024, parallelism=1)
+
+
+def hash_password(password: str) -> str:
+    return PASSWORD_HASHER.hash(password)
+
+
+def verify_password(stored_hash: str, password: str) -> bool:
+    if not stored_hash.startswith('$argon2'):
+        return check_password_hash(stored_hash, password)
+    try:
+        return PASSWORD_HASHER.verify(stored_hash, password)
+    except (Argon2Error, InvalidHashError):
+        return False
+
+
+def password_needs_rehash(stored_hash: str) -> bool:
+    """True для хэшей werkzeug и Argon2 с параметрами слабее PASSWORD_HASHER.
+
+    Более стойкие хэши Argon2 и нераспознанные строки не трогаем
+    """
+    if not stored_hash.startswith('$argon2'):
+        return True
+    try:
+        params = extract_parameters(stored_hash)
+    except (Argon2Error, InvalidHashError):
+        return False
+    current = PASSWORD_HASHER
+    return (params.time_cost < current.time_cost
+            or params.memory_cost < current.memory_cost)
+
+# Настройки каждого соединения с БД: в WAL достаточно synchronous=NORMAL,
+# файл читается через mmap, кэш страниц ~64 МБ, временные таблицы в памяти
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA temp_store=MEMORY",
+)
 
 
 class MobilityType(Enum):
@@ -314,6 +418,32 @@ class AccessibilityFeature(Enum):
     ACCESSIBLE_PARKING = "доступная_парковка"
 
 
+# Номер каждого типа объекта (порядок AccessibilityFeature) для таблиц приоритетов
+FEATURE_IDS = {feature.value: i for i, feature in enumerate(AccessibilityFeature)}
+
+# Приоритеты для каждого типа — неизменяемая таблица, собирается один раз при импорте
+FEATURE_PRIORITIES = MappingProxyType({
+    MobilityType.WHEELCHAIR: MappingProxyType({
+        "пандус_стационарный": 10, "лифт": 10, "широкая_дверь": 8,
+        "доступная_парковка": 7, "пандус_откидной": 9
+    }),
+    MobilityType.VISUALLY_IMPAIRED: MappingProxyType({
+        "тактильная_плитка_направляющая": 10, "светофор_звуковой": 10,
+        "тактильная_плитка_предупреждающая": 9, "кнопка_вызова": 8
+    }),
+    MobilityType.CANE: MappingProxyType({
+        "поручни": 10, "понижение_бордюра": 9
+    })
+})
+
+# Те же приоритеты массивами, индексируемыми номером типа из FEATURE_IDS
+PRIORITY_TABLES = MappingProxyType({
+    mobility: np.array([table.get(feature.value, 0) for feature in AccessibilityFeature], dtype=np.float64)
+    for mobility, table in FEATURE_PRIORITIES.items()
+})
+NO_PRIORITIES = np.zeros(len(FEATURE_IDS))
+
+
 # Административные районы Тулы с корректными не пересекающимися границами (полигоны в формате [lon, lat])
 TULA_DISTRICTS = {
     "Центральный": {
@@ -360,7 +490,7 @@ TULA_DISTRICTS = {
 
 
 # Try to update with real boundaries from OSM
-osm_districts = get_tula_districts_from_osm()
+osm_districts = load_tula_districts()
 if not osm_districts:
     # Fallback to hardcoded
     osm_districts = {}
@@ -388,42 +518,176 @@ else:
             print(f"Updated {key} with OSM data")
 
 
-def point_in_polygon(x, y, polygon):
-    """Проверка, находится ли точка внутри полигона (алгоритм ray casting)"""
-    n = len(polygon)
+# Один раз после загрузки границ: вершины района непрерывным массивом float64 формы (V, 2)
+# и габарит (min_lon, min_lat, max_lon, max_lat). "polygon" остаётся списком для JSON
+for _data in TULA_DISTRICTS.values():
+    _data["vertices"] = np.ascontiguousarray(_data["polygon"], dtype=np.float64)
+    _data["bbox"] = tuple(_data["vertices"].min(axis=0).tolist() + _data["vertices"].max(axis=0).tolist())
+
+
+def _point_in_polygon_array(x, y, poly):
+    """Проверка, находится ли точка внутри полигона (ray casting по массиву вершин float64 формы (V, 2)).
+
+    Эталон границ для всех вариантов ниже: точка на ребре засчитывается по правилу
+    min(y1, y2) < y <= max(y1, y2) и x <= пересечения
+    """
+    n = poly.shape[0]
     inside = False
-    p1x, p1y = polygon[0]
+    p1x = poly[0, 0]
+    p1y = poly[0, 1]
     for i in range(1, n + 1):
-        p2x, p2y = polygon[i % n]
-        if y > min(p1y, p2y):
-            if y <= max(p1y, p2y):
-                if x <= max(p1x, p2x):
-                    if p1y != p2y:
-                        xinters = (y - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
-                    if p1x == p2x or x <= xinters:
-                        inside = not inside
-        p1x, p1y = p2x, p2y
+        p2x = poly[i % n, 0]
+        p2y = poly[i % n, 1]
+        if p1y != p2y and min(p1y, p2y) < y <= max(p1y, p2y):
+            xinters = (y - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
+            if x <= xinters:
+                inside = not inside
+        p1x = p2x
+        p1y = p2y
+    return inside
+
+
+if njit is not None:
+    # Без fastmath: пересечение считается в том же порядке операций, что и в остальных вариантах,
+    # иначе точки на границе района могли бы классифицироваться по-разному
+    _point_in_polygon_array = njit(cache=True)(_point_in_polygon_array)
+
+
+def points_in_polygon(xs, ys, poly):
+    """Пакетный ray casting: маска точек (xs[k], ys[k]) внутри полигона, границы как у _point_in_polygon_array"""
+    inside = np.zeros(len(xs), dtype=bool)
+    n = poly.shape[0]
+    for i in range(n):
+        p1x, p1y = poly[i].tolist()
+        p2x, p2y = poly[(i + 1) % n].tolist()
+        if p1y == p2y:
+            continue
+        crosses = (ys > min(p1y, p2y)) & (ys <= max(p1y, p2y))
+        inside ^= crosses & (xs <= (ys - p1y) * (p2x - p1x) / (p2y - p1y) + p1x)
+    return inside
+
+
+def build_slab_index(polygon):
+    """Разбиение полигона на горизонтальные полосы между соседними y вершин.
+
+    Для каждой полосы хранятся только пересекающие её рёбра (x1, y1, dx, dy),
+    так что проверка точки — бинарный поиск полосы и пара рёбер вместо обхода всех V.
+    """
+    n = len(polygon)
+    edges = []
+    for i in range(n):
+        x1, y1 = polygon[i]
+        x2, y2 = polygon[(i + 1) % n]
+        if y1 != y2:
+            edges.append((min(y1, y2), max(y1, y2), (x1, y1, x2 - x1, y2 - y1)))
+    ys = sorted({float(p[1]) for p in polygon})
+    slabs = [tuple(edge for lo, hi, edge in edges if lo <= ys[k] and hi >= ys[k + 1])
+             for k in range(len(ys) - 1)]
+    return ys, slabs
+
+
+def slab_contains(index, x, y):
+    """Ray casting только по рёбрам полосы, в которую попала точка (те же границы, что у _point_in_polygon_array)"""
+    ys, slabs = index
+    k = bisect_left(ys, y) - 1
+    if k < 0 or k >= len(slabs):
+        return False
+    inside = False
+    for x1, y1, dx, dy in slabs[k]:
+        if x <= (y - y1) * dx / dy + x1:
+            inside = not inside
     return inside
 
 
+def make_point_test(vertices):
+    """Проверка (x, y) для массива вершин района: numba, если установлена, иначе индекс полос"""
+    if njit is None:
+        # Индекс полос обходится чистым Python — ему нужны обычные float, а не скаляры numpy
+        index = build_slab_index(vertices.tolist())
+        return lambda x, y: slab_contains(index, x, y)
+    return lambda x, y: _point_in_polygon_array(x, y, vertices)
+
+
+UNKNOWN_DISTRICT = "Не определен"
+
+# R-дерево по габаритам районов (STRtree из shapely, уже есть в зависимостях geopandas)
+DISTRICT_NAMES = list(TULA_DISTRICTS)
+DISTRICT_POLYGONS = [Polygon(TULA_DISTRICTS[d]["vertices"]) for d in DISTRICT_NAMES]
+DISTRICT_TREE = STRtree(DISTRICT_POLYGONS)
+DISTRICT_TESTS = {d: make_point_test(TULA_DISTRICTS[d]["vertices"]) for d in DISTRICT_NAMES}
+
+
 def get_district_for_point(lat: float, lon: float) -> str:
     """Определяет район по координатам с использованием полигонов"""
-    for district, data in TULA_DISTRICTS.items():
-        polygon = data["polygon"]
-        if point_in_polygon(lon, lat, polygon):  # Note: lon, lat for the function
+    # Точная проверка только для районов, в габарит которых попала точка;
+    # sorted сохраняет порядок TULA_DISTRICTS при пересечении габаритов
+    for i in sorted(DISTRICT_TREE.query(Point(lon, lat))):
+        district = DISTRICT_NAMES[i]
+        if DISTRICT_TESTS[district](lon, lat):  # Note: lon, lat for the function
             return district
-    return "Не определен"
+    return UNKNOWN_DISTRICT
+
+
+def classify_points(lons, lats):
+    """Индекс района для каждой точки (порядок DISTRICT_NAMES), -1 — вне районов"""
+    district_idx = np.full(len(lons), -1)
+    for i, district in enumerate(DISTRICT_NAMES):
+        # Проверка GEOS только для ещё не распределённых точек внутри габарита района
+        min_lon, min_lat, max_lon, max_lat = TULA_DISTRICTS[district]["bbox"]
+        candidates = np.flatnonzero((district_idx == -1) & (lons >= min_lon) & (lons <= max_lon)
+                                    & (lats >= min_lat) & (lats <= max_lat))
+        if candidates.size:
+            # Тот же ray casting, что и у get_district_for_point: точка на общей границе
+            # достаётся тому же району при вставке по одной и пакетом
+            inside = points_in_polygon(lons[candidates], lats[candidates], TULA_DISTRICTS[district]["vertices"])
+            district_idx[candidates[inside]] = i
+    return district_idx
+
+
+def district_labels(lons, lats) -> List[str]:
+    """Название района для каждой точки, UNKNOWN_DISTRICT — вне районов"""
+    return [DISTRICT_NAMES[i] if i >= 0 else UNKNOWN_DISTRICT for i in classify_points(lons, lats).tolist()]
+
+
+def assign_districts(conn):
+    """Заполняет колонку district у объектов, добавленных без неё (одобрения, xml_parser).
+
+    Вызывается на путях записи: после одобрения заявок и при старте
+    """
+    rows = conn.execute("SELECT id, latitude, longitude FROM accessibility_objects WHERE district IS NULL").fetchall()
+    if not rows:
+        return
+    ids, lats, lons = zip(*rows)
+    districts = district_labels(np.asarray(lons, dtype=np.float64), np.asarray(lats, dtype=np.float64))
+    with conn:
+        conn.executemany("UPDATE accessibility_objects SET district = ? WHERE id = ?", list(zip(districts, ids)))
+
+
+# Маппинг типов объектов к типам мобильности
+MOBILITY_FEATURES = {
+    "колясочник": ["пандус_стационарный", "пандус_откидной", "лифт", "широкая_дверь", "доступная_парковка"],
+    "слабовидящий": ["тактильная_плитка_направляющая", "тактильная_плитка_предупреждающая", "светофор_звуковой", "кнопка_вызова"],
+    "опора на трость": ["поручни", "понижение_бордюра"]
+}
+# Обратный словарь: тип объекта -> тип мобильности
+FEATURE_TO_MOBILITY = {feature: mobility for mobility, features in MOBILITY_FEATURES.items() for feature in features}
 
 
 def get_district_statistics(db_path: str = "db/accessibility.db"):
     """Получает статистику доступности по районам"""
     conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    # Получаем все объекты
-    cursor.execute("SELECT feature_type, latitude, longitude FROM accessibility_objects")
-    objects = cursor.fetchall()
+    # Подсчёт по районам и типам делает SQLite (индекс по district, feature_type)
+    counts = conn.execute("""SELECT district, feature_type, COUNT(*) FROM accessibility_objects
+        WHERE district IS NOT NULL GROUP BY district, feature_type""").fetchall()
+    # Строки, записанные в обход assign_districts (например, xml_parser при работающем сервере),
+    # классифицируются в памяти: статистика только читает БД и не берёт блокировку записи
+    pending = conn.execute("""SELECT longitude, latitude, feature_type FROM accessibility_objects
+        WHERE district IS NULL""").fetchall()
     conn.close()
+    if pending:
+        lons, lats, feature_types = zip(*pending)
+        labels = district_labels(np.asarray(lons, dtype=np.float64), np.asarray(lats, dtype=np.float64))
+        counts += [(district, feature_type, 1) for district, feature_type in zip(labels, feature_types)]
 
     stats = {}
     for district in TULA_DISTRICTS.keys():
@@ -441,31 +705,14 @@ def get_district_statistics(db_path: str = "db/accessibility.db"):
             "color": TULA_DISTRICTS[district]["color"]
         }
 
-    # Маппинг типов объектов к типам мобильности
-    mobility_mapping = {
-        "колясочник": ["пандус_стационарный", "пандус_откидной", "лифт", "широкая_дверь", "доступная_парковка"],
-        "слабовидящий": ["тактильная_плитка_направляющая", "тактильная_плитка_предупреждающая", "светофор_звуковой", "кнопка_вызова"],
-        "опора на трость": ["поручни", "понижение_бордюра"]
-    }
+    for district, feature_type, n in counts:
+        if district not in stats:
+            continue
+        stats[district]["total_objects"] += n
+        by_type = stats[district]["by_type"]
+        by_type[feature_type] = by_type.get(feature_type, 0) + n
 
-    for obj in objects:
-        feature_type, lat, lon = obj
-        district = get_district_for_point(lat, lon)
-        if district in stats:
-            stats[district]["total_objects"] += 1
-            if feature_type not in stats[district]["by_type"]:
-                stats[district]["by_type"][feature_type] = 0
-            stats[district]["by_type"][feature_type] += 1
-
-            # Определяем тип мобильности
-            matched = False
-            for mobility, types in mobility_mapping.items():
-                if feature_type in types:
-                    stats[district]["by_mobility"][mobility] += 1
-                    matched = True
-                    break
-            if not matched:
-                stats[district]["by_mobility"]["другие"] += 1
+        stats[district]["by_mobility"][FEATURE_TO_MOBILITY.get(feature_type, "другие")] += n
 
     return stats
 
@@ -558,17 +805,66 @@ class RouteSegment:
 # ===================================================================
 # 1. AccessibilityDatabase — 60 уникальных объектов в Туле (по 20 на тип)
 # ===================================================================
+# Объекты в каждой точке сетки района: (тип, подпись, сдвиг lat, сдвиг lon)
+SEED_POINTS_PER_DISTRICT = 4
+SEED_OBJECT_SPEC = [
+    # Колясочники
+    ("пандус_стационарный", "Пандус", 0.0, 0.0),
+    ("лифт", "Лифт", 0.001, 0.001),
+    ("широкая_дверь", "Широкая дверь", -0.001, -0.001),
+    ("доступная_парковка", "Парковка", 0.002, 0.002),
+    # Слабовидящие
+    ("тактильная_плитка_направляющая", "Тактильная плитка", 0.0, 0.001),
+    ("светофор_звуковой", "Звуковой светофор", 0.001, 0.0),
+    ("тактильная_плитка_предупреждающая", "Предупреждающая плитка", -0.001, 0.0),
+    ("кнопка_вызова", "Кнопка вызова", 0.0, -0.001),
+    # Опора на трость
+    ("поручни", "Поручни", 0.001, -0.001),
+    ("понижение_бордюра", "Понижение бордюра", -0.001, 0.001),
+]
+
+
+# Перенос одобренной заявки с координатами в основную таблицу — одним запросом без SELECT в Python
+SQL_COPY_APPROVED = """INSERT INTO accessibility_objects
+    (feature_type, description, latitude, longitude, address)
+    SELECT feature_type, description, latitude, longitude, address FROM user_submissions
+    WHERE id = ? AND latitude IS NOT NULL AND longitude IS NOT NULL"""
+
+# Кэш геокодирования в SQLite: записи старше месяца и сверх лимита строк удаляются
+# при старте и после каждых GEOCODE_PRUNE_EVERY записей
+GEOCODE_DB_TTL = 30 * 24 * 3600
+GEOCODE_DB_MAX_ROWS = 100_000
+GEOCODE_PRUNE_EVERY = 1000
+
+
 class AccessibilityDatabase:
     def __init__(self, db_path: str = "db/accessibility.db"):
         self.db_path = db_path
+        # Одно соединение на поток, переиспользуется всеми методами
+        self._local = threading.local()
+        self._geocode_writes = 0
         self.init_database()
         self.add_tula_accessibility_all()  # ← 60 объектов!
+        # Районы для строк, добавленных без них (например, xml_parser до запуска сервера)
+        assign_districts(self._connect())
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            for pragma in CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+        return conn
 
     def init_database(self):
         # Ensure the database directory exists
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
+        # WAL сохраняется в файле БД: один fsync на commit, чтение не блокируется записью
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA wal_autocheckpoint=1000")
         cursor.execute("""CREATE TABLE IF NOT EXISTS accessibility_objects (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             feature_type TEXT NOT NULL,
@@ -576,8 +872,14 @@ class AccessibilityDatabase:
             latitude REAL NOT NULL,
             longitude REAL NOT NULL,
             address TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            district TEXT
         )""")
+        # Район хранится в строке, чтобы статистика считалась GROUP BY без проверок полигонов
+        cursor.execute("PRAGMA table_info(accessibility_objects)")
+        if "district" not in {row[1] for row in cursor.fetchall()}:
+            cursor.execute("ALTER TABLE accessibility_objects ADD COLUMN district TEXT")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_objects_district_type ON accessibility_objects(district, feature_type)")
         cursor.execute("""CREATE TABLE IF NOT EXISTS user_submissions (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             feature_type TEXT NOT NULL,
@@ -590,109 +892,317 @@ class AccessibilityDatabase:
             status TEXT DEFAULT 'pending',
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )""")
+        # get_pending_submissions и админка выбирают заявки по статусу
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_submissions_status ON user_submissions(status)")
+        # Ответы геокодера (JSON) по ключу запроса; переживают перезапуск сервера
+        cursor.execute("""CREATE TABLE IF NOT EXISTS geocode_cache (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )""")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_geocode_cache_created ON geocode_cache(created_at)")
+        self._prune_geocode_cache(cursor)
         cursor.execute("""CREATE TABLE IF NOT EXISTS admins (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             username TEXT UNIQUE NOT NULL,
             password TEXT NOT NULL,
             must_change_password INTEGER DEFAULT 1
         )""")
+        # Полнотекстовый префиксный индекс адресов для автодополнения.
+        # rowid = id для accessibility_objects и -id для user_submissions
+        cursor.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS addr_fts USING fts5(
+            address,
+            source UNINDEXED,
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3 4'
+        )""")
+        for table, source, sign in (("accessibility_objects", "objects", ""),
+                                    ("user_submissions", "submissions", "-")):
+            cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_ai AFTER INSERT ON {table}
+                WHEN new.address IS NOT NULL BEGIN
+                INSERT INTO addr_fts (rowid, address, source) VALUES ({sign}new.id, new.address, '{source}');
+            END""")
+            cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_ad AFTER DELETE ON {table} BEGIN
+                DELETE FROM addr_fts WHERE rowid = {sign}old.id;
+            END""")
+            cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_au AFTER UPDATE OF address ON {table} BEGIN
+                DELETE FROM addr_fts WHERE rowid = {sign}old.id;
+                INSERT INTO addr_fts (rowid, address, source)
+                    SELECT {sign}new.id, new.address, '{source}' WHERE new.address IS NOT NULL;
+            END""")
+        # Пространственный индекс объектов (R*Tree) для подсказок в пределах видимой области карты
+        cursor.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS access_rtree USING rtree(
+            id, min_lon, max_lon, min_lat, max_lat
+        )""")
+        cursor.execute("""CREATE TRIGGER IF NOT EXISTS accessibility_objects_rtree_ai AFTER INSERT ON accessibility_objects BEGIN
+            INSERT INTO access_rtree VALUES (new.id, new.longitude, new.longitude, new.latitude, new.latitude);
+        END""")
+        cursor.execute("""CREATE TRIGGER IF NOT EXISTS accessibility_objects_rtree_ad AFTER DELETE ON accessibility_objects BEGIN
+            DELETE FROM access_rtree WHERE id = old.id;
+        END""")
+        cursor.execute("""CREATE TRIGGER IF NOT EXISTS accessibility_objects_rtree_au
+            AFTER UPDATE OF latitude, longitude ON accessibility_objects BEGIN
+            UPDATE access_rtree SET min_lon = new.longitude, max_lon = new.longitude,
+                min_lat = new.latitude, max_lat = new.latitude WHERE id = new.id;
+        END""")
+        # Пересобираем индексы на старте, чтобы подхватить строки, добавленные до появления триггеров
+        cursor.execute("DELETE FROM access_rtree")
+        cursor.execute("""INSERT INTO access_rtree
+            SELECT id, longitude, longitude, latitude, latitude FROM accessibility_objects""")
+        cursor.execute("DELETE FROM addr_fts")
+        cursor.execute("""INSERT INTO addr_fts (rowid, address, source)
+            SELECT id, address, 'objects' FROM accessibility_objects WHERE address IS NOT NULL""")
+        cursor.execute("""INSERT INTO addr_fts (rowid, address, source)
+            SELECT -id, address, 'submissions' FROM user_submissions WHERE address IS NOT NULL""")
         # Insert default admin if not exists
         cursor.execute("SELECT COUNT(*) FROM admins WHERE username = 'admin'")
         if cursor.fetchone()[0] == 0:
             cursor.execute("INSERT INTO admins (username, password, must_change_password) VALUES (?, ?, ?)",
-                           ('admin', generate_password_hash('admin'), 1))
+                           ('admin', hash_password('admin'), 1))
         conn.commit()
-        conn.close()
 
     def add_object(self, obj: AccessibilityObject) -> int:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("""INSERT INTO accessibility_objects
-            (feature_type, description, latitude, longitude, address)
-            VALUES (?, ?, ?, ?, ?)""",
-            (obj.feature_type, obj.description, obj.latitude, obj.longitude, obj.address))
-        obj_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return obj_id
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute("""INSERT INTO accessibility_objects
+                (feature_type, description, latitude, longitude, address, district)
+                VALUES (?, ?, ?, ?, ?, ?)""",
+                (obj.feature_type, obj.description, obj.latitude, obj.longitude, obj.address,
+                 get_district_for_point(obj.latitude, obj.longitude)))
+        return cursor.lastrowid
 
     def add_user_submission(self, feature_type: str, description: str, address: str, photo_path: str, lat: Optional[float] = None, lon: Optional[float] = None, submitted_by: str = "anonymous"):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("""INSERT INTO user_submissions
-            (feature_type, description, address, photo_path, latitude, longitude, submitted_by)
-            VALUES (?, ?, ?, ?, ?, ?, ?)""",
-            (feature_type, description, address, photo_path, lat, lon, submitted_by))
-        conn.commit()
-        conn.close()
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute("""INSERT INTO user_submissions
+                (feature_type, description, address, photo_path, latitude, longitude, submitted_by)
+                VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (feature_type, description, address, photo_path, lat, lon, submitted_by))
+        return cursor.lastrowid
+
+    def clear_submission_photo(self, submission_id: int):
+        """Снять фото с заявки, если файл так и не удалось сохранить"""
+        conn = self._connect()
+        with conn:
+            conn.execute("UPDATE user_submissions SET photo_path = NULL WHERE id = ?", (submission_id,))
 
     def get_pending_submissions(self):
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM user_submissions WHERE status = 'pending'")
         rows = cursor.fetchall()
-        conn.close()
         return rows
 
-    def approve_submission(self, submission_id: int):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("UPDATE user_submissions SET status = 'approved' WHERE id = ?", (submission_id,))
-        # Move to main table if coordinates are available
-        cursor.execute("SELECT feature_type, description, latitude, longitude, address FROM user_submissions WHERE id = ?", (submission_id,))
-        row = cursor.fetchone()
-        if row and row[2] is not None and row[3] is not None:
-            cursor.execute("""INSERT INTO accessibility_objects
-                (feature_type, description, latitude, longitude, address)
-                VALUES (?, ?, ?, ?, ?)""", row)
-        conn.commit()
-        conn.close()
+    def search_addresses(self, query: str, limit: int = 10,
+                         bbox: Optional[Tuple[float, float, float, float]] = None) -> List[str]:
+        """Поиск адресов по префиксам слов запроса через FTS5-индекс.
 
-    def add_tula_accessibility_all(self):
-        conn = sqlite3.connect(self.db_path)
+        bbox = (запад, юг, восток, север) ограничивает поиск объектами в этой области (R*Tree)
+        """
+        tokens = re.findall(r"\w+", query.lower())
+        if not tokens:
+            return []
+        match = " ".join(f'"{token}"*' for token in tokens)
+        conn = self._connect()
         cursor = conn.cursor()
-        cursor.execute("DELETE FROM accessibility_objects")
-        conn.commit()
+        try:
+            if bbox is None:
+                cursor.execute("SELECT DISTINCT address FROM addr_fts WHERE addr_fts MATCH ? LIMIT ?", (match, limit))
+            else:
+                west, south, east, north = bbox
+                cursor.execute("""SELECT DISTINCT f.address FROM addr_fts f
+                    JOIN access_rtree r ON r.id = f.rowid
+                    WHERE addr_fts MATCH ? AND r.min_lon >= ? AND r.max_lon <= ?
+                        AND r.min_lat >= ? AND r.max_lat <= ?
+                    LIMIT ?""", (match, west, east, south, north, limit))
+            rows = cursor.fetchall()
+        except sqlite3.OperationalError as e:
+            print(f"Ошибка поиска адресов: {e}")
+            rows = []
+        return [row[0] for row in rows]
+
+    def get_geocode(self, key: str):
+        """Сохранённый ответ геокодера или None, если записи нет или она устарела"""
+        row = self._connect().execute(
+            "SELECT value FROM geocode_cache WHERE key = ? AND created_at >= ?",
+            (key, time.time() - GEOCODE_DB_TTL)).fetchone()
+        if row is None:
+            return None
+        value = json.loads(row[0])
+        # Координаты хранятся JSON-массивом, наружу отдаются кортежем, как из геокодера
+        return tuple(value) if isinstance(value, list) else value
+
+    def set_geocode(self, key: str, value):
+        conn = self._connect()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO geocode_cache (key, value, created_at) VALUES (?, ?, ?)",
+                         (key, json.dumps(value, ensure_ascii=False), time.time()))
+            self._geocode_writes += 1
+            if self._geocode_writes % GEOCODE_PRUNE_EVERY == 0:
+                self._prune_geocode_cache(conn)
+
+    @staticmethod
+    def _prune_geocode_cache(conn):
+        conn.execute("DELETE FROM geocode_cache WHERE created_at < ?", (time.time() - GEOCODE_DB_TTL,))
+        conn.execute("""DELETE FROM geocode_cache WHERE key IN (
+            SELECT key FROM geocode_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)""",
+                     (GEOCODE_DB_MAX_ROWS,))
+
+    def get_all_addresses(self) -> List[str]:
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute("""SELECT address FROM accessibility_objects WHERE address IS NOT NULL
+            UNION SELECT address FROM user_submissions WHERE address IS NOT NULL""")
+        rows = cursor.fetchall()
+        return [row[0] for row in rows]
 
-        # Генерируем объекты для каждого района
-        all_objects = []
-        for district, data in TULA_DISTRICTS.items():
-            polygon = data["polygon"]
-            min_lat = min(p[1] for p in polygon)
-            max_lat = max(p[1] for p in polygon)
-            min_lon = min(p[0] for p in polygon)
-            max_lon = max(p[0] for p in polygon)
+    def approve_submission(self, submission_id: int):
+        conn = self._connect()
+        with conn:
+            # Move to main table if coordinates are available
+            conn.execute(SQL_COPY_APPROVED, (submission_id,))
+            conn.execute("UPDATE user_submissions SET status = 'approved' WHERE id = ?", (submission_id,))
+        assign_districts(conn)
+
+    def approve_submissions(self, submission_ids: List[int]):
+        """Одобрение нескольких заявок одной транзакцией"""
+        params = [(i,) for i in submission_ids]
+        conn = self._connect()
+        with conn:
+            conn.executemany("UPDATE user_submissions SET status = 'approved' WHERE id = ?", params)
+            # Move to main table if coordinates are available
+            conn.executemany(SQL_COPY_APPROVED, params)
+        assign_districts(conn)
 
-            # 4 объекта каждого типа на район
-            for i in range(4):
-                lat = min_lat + (max_lat - min_lat) * (i + 0.5) / 4
-                lon = min_lon + (max_lon - min_lon) * (i + 0.5) / 4
+    def add_tula_accessibility_all(self):
+        conn = self._connect()
+        cursor = conn.cursor()
+        # Пересоздаваемые при старте данные: fsync на этом соединении не нужен
+        cursor.execute("PRAGMA synchronous=OFF")
+        try:
+            cursor.execute("DELETE FROM accessibility_objects")
+
+            # Генерируем объекты для каждого района: сетка координат считается массивами,
+            # строки для executemany собираются сразу, без промежуточных AccessibilityObject
+            offsets = (np.arange(SEED_POINTS_PER_DISTRICT) + 0.5) / SEED_POINTS_PER_DISTRICT
+            dlat = np.array([spec[2] for spec in SEED_OBJECT_SPEC])
+            dlon = np.array([spec[3] for spec in SEED_OBJECT_SPEC])
+            rows = []
+            for district, data in TULA_DISTRICTS.items():
+                min_lon, min_lat, max_lon, max_lat = data["bbox"]
+                lats = (min_lat + (max_lat - min_lat) * offsets)[:, None] + dlat
+                lons = (min_lon + (max_lon - min_lon) * offsets)[:, None] + dlon
+                name = data['name']
+                for i in range(SEED_POINTS_PER_DISTRICT):
+                    rows.extend((feature_type, f"{label} в {name}", lat, lon, f"{name}, объект {i + 1}")
+                                for (feature_type, label, _, _), lat, lon
+                                in zip(SEED_OBJECT_SPEC, lats[i].tolist(), lons[i].tolist()))
+
+            districts = district_labels(np.array([row[3] for row in rows]), np.array([row[2] for row in rows]))
+
+            # Удаление и вставка — одна транзакция и один executemany вместо соединения на объект
+            cursor.executemany("""INSERT INTO accessibility_objects
+                (feature_type, description, latitude, longitude, address, district)
+                VALUES (?, ?, ?, ?, ?, ?)""",
+                [row + (district,) for row, district in zip(rows, districts)])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            # Соединение общее для потока: остальные записи снова идут с synchronous=NORMAL
+            cursor.execute("PRAGMA synchronous=NORMAL")
 
-                # Колясочники
-                all_objects.append(AccessibilityObject(None, "пандус_стационарный", f"Пандус в {data['name']}", lat, lon, f"{data['name']}, объект {i+1}"))
-                all_objects.append(AccessibilityObject(None, "лифт", f"Лифт в {data['name']}", lat + 0.001, lon + 0.001, f"{data['name']}, объект {i+1}"))
-                all_objects.append(AccessibilityObject(None, "широкая_дверь", f"Широкая дверь в {data['name']}", lat - 0.001, lon - 0.001, f"{data['name']}, объект {i+1}"))
-                all_objects.append(AccessibilityObject(None, "доступная_парковка", f"Парковка в {data['name']}", lat + 0.002, lon + 0.002, f"{data['name']}, объект {i+1}"))
+        print(f"УСПЕШНО: добавлено {len(rows)} объектов доступности в Туле (по 12 на каждый тип в каждом районе)!")
 
-                # Слабовидящие
-                all_objects.append(AccessibilityObject(None, "тактильная_плитка_направляющая", f"Тактильная плитка в {data['name']}", lat, lon + 0.001, f"{data['name']}, объект {i+1}"))
-                all_objects.append(AccessibilityObject(None, "светофор_звуковой", f"Звуковой светофор в {data['name']}", lat + 0.001, lon, f"{data['name']}, объект {i+1}"))
-                all_objects.append(AccessibilityObject(None, "тактильная_плитка_предупреждающая", f"Предупреждающая плитка в {data['name']}", lat - 0.001, lon, f"{data['name']}, объект {i+1}"))
-                all_objects.append(AccessibilityObject(None, "кнопка_вызова", f"Кнопка вызова в {data['name']}", lat, lon - 0.001, f"{data['name']}, объект {i+1}"))
 
-                # Опора на трость
-                all_objects.append(AccessibilityObject(None, "поручни", f"Поручни в {data['name']}", lat + 0.001, lon - 0.001, f"{data['name']}, объект {i+1}"))
-                all_objects.append(AccessibilityObject(None, "понижение_бордюра", f"Понижение бордюра в {data['name']}", lat - 0.001, lon + 0.001, f"{data['name']}, объект {i+1}"))
+class AddressTrie:
+    """Префиксное дерево адресов (ключ — адрес в нижнем регистре) для автодополнения.
 
-        for obj in all_objects:
-            self.add_object(obj)
+    Общее для потоков Flask: вставка и обход идут под блокировкой
+    """
 
-        print(f"УСПЕШНО: добавлено {len(all_objects)} объектов доступности в Туле (по 12 на каждый тип в каждом районе)!")
-        conn.close()
+    def __init__(self):
+        self._root = {}
+        self._lock = threading.Lock()
+        # Номер версии растёт при вставке: закэшированный узел «нет такого префикса» устаревает
+        self._version = 0
+        # Путь к узлу последнего запроса своего потока: (версия, префикс, узел)
+        self._local = threading.local()
+
+    def insert(self, address: str):
+        with self._lock:
+            node = self._root
+            for ch in address.lower():
+                node = node.setdefault(ch, {})
+            node[None] = address
+            self._version += 1
+
+    def _find(self, prefix: str):
+        version, last_prefix, node = getattr(self._local, 'last', (None, "", None))
+        if version == self._version and prefix.startswith(last_prefix):
+            rest = prefix[len(last_prefix):]
+        else:
+            node, rest = self._root, prefix
+        for ch in rest:
+            if node is None:
+                break
+            node = node.get(ch)
+        self._local.last = (self._version, prefix, node)
+        return node
+
+    def search(self, prefix: str, limit: int = 5) -> List[str]:
+        results = []
+        with self._lock:
+            node = self._find(prefix.lower())
+            stack = [node] if node is not None else []
+            while stack and len(results) < limit:
+                node = stack.pop()
+                if None in node:
+                    results.append(node[None])
+                stack.extend(child for key, child in reversed(node.items()) if key is not None)
+        return results
+
+
+# Сколько результатов геокодирования держать в памяти (остальные — в таблице geocode_cache)
+GEOCODE_MEMORY_SIZE = 4096
+
+
+class TTLCache:
+    """Небольшой LRU-кэш с ограничением времени жизни записей"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
 
 
 class OpenStreetMapAPI:
-    def __init__(self):
+    def __init__(self, db: Optional["AccessibilityDatabase"] = None):
         self.base_url = "https://nominatim.openstreetmap.org"
         # Используем НАДЁЖНЫЙ сервер, который РЕАЛЬНО поддерживает foot в 2025
         self.routing_url = "https://routing.openstreetmap.de/routed-foot"
@@ -700,16 +1210,56 @@ class OpenStreetMapAPI:
         self.headers = {
             "User-Agent": "AccessibleNavigationApp/1.0 (+https://github.com/yourname/accessible-nav)"
         }
+        # Постоянная сессия: keep-alive вместо нового TCP+TLS на каждый запрос к Nominatim и OSRM
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.mount("https://", HTTPAdapter(
+            pool_connections=8, pool_maxsize=16, max_retries=Retry(total=2, backoff_factor=0.2)))
+        # Кэш геокодирования: LRU в памяти на GEOCODE_MEMORY_SIZE записей поверх таблицы
+        # geocode_cache в SQLite (db), которая переживает перезапуск; без db — только память
+        self._cache_lock = threading.Lock()
+        self._cache_db = db
+        self._cache = OrderedDict()
+        # Готовые маршруты OSRM (успешные ответы) на час
+        self._route_cache = TTLCache(maxsize=1024, ttl=3600)
+
+    def _remember(self, key: str, value):
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        if len(self._cache) > GEOCODE_MEMORY_SIZE:
+            self._cache.popitem(last=False)
+
+    def _cached(self, key: str, fetch):
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        value = self._cache_db.get_geocode(key) if self._cache_db is not None else None
+        if value is not None:
+            with self._cache_lock:
+                self._remember(key, value)
+            return value
+        value = fetch()
+        # Неудачи не кэшируем: они бывают временными (таймаут, лимит Nominatim)
+        if value is not None:
+            with self._cache_lock:
+                self._remember(key, value)
+            if self._cache_db is not None:
+                self._cache_db.set_geocode(key, value)
+        return value
 
     def geocode(self, address: str) -> Optional[Tuple[float, float]]:
         # Default to Tula if no city specified
         if not any(city in address.lower() for city in ['тула', 'moscow', 'спб', 'екатеринбург']):
             address += ", Тула"
+        # Регистр и лишние пробелы не влияют на ключ кэша
+        return self._cached("q:" + " ".join(address.lower().split()), lambda: self._geocode(address))
+
+    def _geocode(self, address: str) -> Optional[Tuple[float, float]]:
         try:
-            response = requests.get(
+            response = self.session.get(
                 f"{self.base_url}/search",
                 params={"q": address, "format": "json", "limit": 1, "countrycodes": "ru"},
-                headers=self.headers,
                 timeout=10
             )
             response.raise_for_status()
@@ -720,12 +1270,34 @@ class OpenStreetMapAPI:
             print(f"Геокодирование ошибка: {e}")
         return None
 
+    def suggest(self, query: str, limit: int) -> Optional[List[str]]:
+        """Полные названия (display_name) до limit адресов по запросу; None при ошибке"""
+        key = f"s:{limit}:" + " ".join(query.lower().split())
+        return self._cached(key, lambda: self._suggest(query, limit))
+
+    def _suggest(self, query: str, limit: int) -> Optional[List[str]]:
+        try:
+            response = self.session.get(
+                f"{self.base_url}/search",
+                params={"q": query, "format": "json", "limit": limit, "countrycodes": "ru"},
+                timeout=5
+            )
+            response.raise_for_status()
+            return [item['display_name'] for item in response.json()]
+        except Exception as e:
+            print(f"Suggest error: {e}")
+        return None
+
     def reverse_geocode(self, lat: float, lon: float) -> Optional[str]:
+        # ~1 м точности достаточно: соседние клики попадают в одну запись кэша
+        lat, lon = round(lat, 5), round(lon, 5)
+        return self._cached(f"r:{lat},{lon}", lambda: self._reverse_geocode(lat, lon))
+
+    def _reverse_geocode(self, lat: float, lon: float) -> Optional[str]:
         try:
-            response = requests.get(
+            response = self.session.get(
                 f"{self.base_url}/reverse",
                 params={"lat": lat, "lon": lon, "format": "json", "addressdetails": 1},
-                headers=self.headers,
                 timeout=10
             )
             response.raise_for_status()
@@ -740,6 +1312,17 @@ class OpenStreetMapAPI:
         return self.get_route_multi([start, end])
 
     def get_route_multi(self, points: List[Tuple[float, float]]):
+        # Ключ — точки, округлённые до ~1 м: повторный запрос того же маршрута не идёт в OSRM
+        key = tuple((round(lat, 5), round(lon, 5)) for lat, lon in points)
+        cached = self._route_cache.get(key)
+        if cached is not None:
+            return cached
+        result = self._fetch_route(key)
+        if result[0] is not None:
+            self._route_cache.set(key, result)
+        return result
+
+    def _fetch_route(self, points):
         try:
             # ЭТОТ сервер РЕАЛЬНО даёт пеший маршрут!
             coords_str = ";".join(f"{p[1]},{p[0]}" for p in points)
@@ -749,7 +1332,7 @@ class OpenStreetMapAPI:
                 "geometries": "geojson",
                 "steps": "true"
             }
-            response = requests.get(url, params=params, timeout=25)
+            response = self.session.get(url, params=params, timeout=25)
             response.raise_for_status()
             data = response.json()
 
@@ -770,27 +1353,79 @@ class OpenStreetMapAPI:
         return None, None
 
 
+# Пешеходные пути из Overpass кэшируются клетками сетки со стороной OVERPASS_TILE градусов
+OVERPASS_URL = "https://overpass-api.de/api/interpreter"
+OVERPASS_TILE = 0.02
+# Потоковое чтение response.raw обходит обёртки requests: обрыв или зависание посреди тела
+# приходит как исключение urllib3 (ReadTimeoutError, ProtocolError) или OSError
+OVERPASS_ERRORS = ((requests.RequestException, URLLib3Error, OSError, ValueError, KeyError)
+                   + ((ijson.JSONError,) if ijson else ()))
+
+
+def read_overpass_nodes(response) -> np.ndarray:
+    """Узлы (lat, lon) всех путей из ответа Overpass (out geom) массивом (K, 2)"""
+    if ijson is not None:
+        # Потоковый разбор: словари путей и весь список elements в памяти не собираются
+        response.raw.decode_content = True
+        geoms = ijson.items(response.raw, "elements.item.geometry.item", use_float=True)
+    else:
+        # orjson (если установлен) разбирает ответ из одних чисел заметно быстрее json
+        data = orjson.loads(response.content) if orjson is not None else response.json()
+        geoms = (geom for way in data["elements"] for geom in way.get("geometry", ()))
+    flat = (value for geom in geoms for value in (geom["lat"], geom["lon"]))
+    return np.fromiter(flat, dtype=np.float64).reshape(-1, 2)
+
+
+# Генератор случайных чисел для отбора и генерации объектов у маршрута (можно засеять для воспроизводимости)
+ROUTE_RNG = random.Random()
+
+# Пул для независимых сетевых запросов при построении маршрута (геокодирование начала и конца)
+ROUTE_EXECUTOR = ThreadPoolExecutor(max_workers=4)
+
+# Объект ближе этого к вершине короткого маршрута (~50 м) считается лежащим на нём
+WAYPOINT_ON_ROUTE = 0.00045
+
+# Предел элементов матрицы расстояний в NumPy-варианте RouteIndex.nearest (~8 МБ float64)
+NEAREST_BLOCK_SIZE = 1 << 20
+
+
+class RouteIndex:
+    """Вершины маршрута (lat, lon) массивом (N, 2) и поиск ближайшей вершины для точек.
+
+    Дерево строится один раз на маршрут: cKDTree из scipy, если установлена, иначе NumPy.
+    """
+
+    def __init__(self, route_coords):
+        self.pts = np.asarray(route_coords, dtype=np.float64)
+        self.tree = cKDTree(self.pts) if cKDTree is not None else None
+
+    def nearest(self, points):
+        """(расстояния, индексы ближайших вершин) для массива точек (P, 2)"""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if self.tree is not None:
+            return self.tree.query(points, k=1)
+        # Матрица квадратов расстояний точки × вершины, блоками не больше NEAREST_BLOCK_SIZE элементов
+        dists = np.empty(len(points))
+        idx = np.empty(len(points), dtype=np.intp)
+        step = max(1, NEAREST_BLOCK_SIZE // max(len(self.pts), 1))
+        for start in range(0, len(points), step):
+            block = points[start:start + step]
+            d2 = ((block[:, None, :] - self.pts[None, :, :]) ** 2).sum(axis=-1)
+            block_idx = d2.argmin(axis=1)
+            idx[start:start + step] = block_idx
+            dists[start:start + step] = np.sqrt(d2[np.arange(len(block)), block_idx])
+        return dists, idx
+
+
 # ===================================================================
 # AccessibleNavigationSystem — УМНЫЙ маршрут: короткий + приоритет доступности
 # ===================================================================
 class AccessibleNavigationSystem:
     def __init__(self, db_path: str = "db/accessibility.db"):
         self.db = AccessibilityDatabase(db_path)
-        self.osm = OpenStreetMapAPI()
-        # Приоритеты для каждого типа
-        self.feature_priorities = {
-            MobilityType.WHEELCHAIR: {
-                "пандус_стационарный": 10, "лифт": 10, "широкая_дверь": 8,
-                "доступная_парковка": 7, "пандус_откидной": 9
-            },
-            MobilityType.VISUALLY_IMPAIRED: {
-                "тактильная_плитка_направляющая": 10, "светофор_звуковой": 10,
-                "тактильная_плитка_предупреждающая": 9, "кнопка_вызова": 8
-            },
-            MobilityType.CANE: {
-                "поручни": 10, "понижение_бордюра": 9
-            }
-        }
+        self.osm = OpenStreetMapAPI(self.db)
+        # Узлы пешеходных путей Overpass по клеткам сетки OVERPASS_TILE: массив (K, 2) на клетку
+        self._pedestrian_tiles = TTLCache(maxsize=4096, ttl=24 * 3600)
 
     def find_route(self, start_address: str, end_address: str,
                     mobility_type: MobilityType,
@@ -798,15 +1433,21 @@ class AccessibleNavigationSystem:
                     start_coords: Optional[Tuple[float, float]] = None,
                     end_coords: Optional[Tuple[float, float]] = None) -> Dict:
 
-        # 1. Геокодирование
+        # 1. Геокодирование: оба адреса запрашиваются параллельно, а не один за другим
+        use_location = start_address.lower() == "текущий" and user_location
+        start_future = None
+        if not start_coords and not use_location:
+            start_future = ROUTE_EXECUTOR.submit(self.osm.geocode, start_address)
+        end_future = None if end_coords else ROUTE_EXECUTOR.submit(self.osm.geocode, end_address)
+
         if start_coords:
             start_coords_tuple = start_coords
             start_addr = "Выбранное место на карте"
-        elif start_address.lower() == "текущий" and user_location:
+        elif use_location:
             start_coords_tuple = user_location
             start_addr = "Текущее местоположение"
         else:
-            start_coords_tuple = self.osm.geocode(start_address)
+            start_coords_tuple = start_future.result()
             if not start_coords_tuple:
                 return {"error": "Не удалось найти начальный адрес"}
             start_addr = start_address
@@ -815,15 +1456,18 @@ class AccessibleNavigationSystem:
             end_coords_tuple = end_coords
             end_addr = "Выбранное место на карте"
         else:
-            end_coords_tuple = self.osm.geocode(end_address)
+            end_coords_tuple = end_future.result()
             if not end_coords_tuple:
                 return {"error": "Не удалось найти конечный адрес"}
             end_addr = end_address
 
-        # 2. Сначала строим САМЫЙ КОРОТКИЙ маршрут
+        # 2. Сначала строим САМЫЙ КОРОТКИЙ маршрут, параллельно запрашивая пешеходные пути
+        # вокруг его концов: обычно маршрут не выходит за эти клетки и Overpass уже не ждём
+        prefetch = ROUTE_EXECUTOR.submit(self.prefetch_pedestrian_tiles, [start_coords_tuple, end_coords_tuple])
         base_route_coords, base_data = self.osm.get_route(start_coords_tuple, end_coords_tuple)
         if not base_route_coords:
             return {"error": "Не удалось построить маршрут"}
+        prefetch.result()
 
         base_distance = base_data["distance"]
         base_duration = int(base_data["duration"] / 60)
@@ -831,57 +1475,54 @@ class AccessibleNavigationSystem:
         start_lat, start_lon = start_coords_tuple
         end_lat, end_lon = end_coords_tuple
 
+        # Индекс вершин маршрута — общий для отбора объектов и их привязки к маршруту
+        route_index = RouteIndex(base_route_coords)
+
         # 3. Генерируем объекты доступности в окрестностях маршрута (500м - 1км)
-        unique_objects = self.generate_accessibility_objects(base_route_coords, mobility_type)
+        unique_objects = self.generate_accessibility_objects(base_route_coords, mobility_type, route_index)
 
         # 4. Выбираем до 6 лучших объектов (по приоритету + близости + порядку следования)
-        priorities = self.feature_priorities.get(mobility_type, {})
-
-        # Compute cumulative distances along the route
-        cum_dist = [0.0]
-        for i in range(1, len(base_route_coords)):
-            prev = base_route_coords[i-1]
-            curr = base_route_coords[i]
-            dist = ((curr[0] - prev[0])**2 + (curr[1] - prev[1])**2)**0.5
-            cum_dist.append(cum_dist[-1] + dist)
-
-        def score_object(obj):
-            lat, lon, ftype, desc, addr, dist = obj
-            priority = priorities.get(ftype, 0)
-            # Бонус за близость к началу/концу
-            start_dist = ((lat - start_lat)**2 + (lon - start_lon)**2)**0.5
-            end_dist = ((lat - end_lat)**2 + (lon - end_lon)**2)**0.5
-            position_bonus = max(0, 0.001 - min(start_dist, end_dist)) * 100000  # бонус за близость к началу/концу
-            distance_penalty = dist * 500000  # штраф за удаленность от маршрута
-            return priority * 1000 + position_bonus - distance_penalty
-
-        unique_objects.sort(key=score_object, reverse=True)
-        best_objects = unique_objects[:6]
-
-        # Add cumulative distance to each object and sort by position along route
-        for i, obj in enumerate(best_objects):
-            obj = list(obj)  # convert tuple to list
-            lat, lon = obj[0], obj[1]
-            min_d = float('inf')
-            closest_idx = 0
-            for idx, (rlat, rlon) in enumerate(base_route_coords):
-                d = ((lat - rlat)**2 + (lon - rlon)**2)**0.5
-                if d < min_d:
-                    min_d = d
-                    closest_idx = idx
-            obj_cum_dist = cum_dist[closest_idx]
-            obj.append(obj_cum_dist)
-            best_objects[i] = obj  # update the list
-
-        best_objects.sort(key=lambda x: x[6])  # sort by cumulative distance
-
-        # Filter to ensure minimum distance along route to avoid close waypoints
+        priority_table = PRIORITY_TABLES.get(mobility_type, NO_PRIORITIES)
+
+        # Compute cumulative distances along the route: вершины маршрута — массив (N, 2),
+        # длины сегментов и накопленная сумма считаются в NumPy одним проходом
+        deltas = np.diff(route_index.pts, axis=0)
+        cum_dist = np.concatenate(([0.0], np.cumsum(np.sqrt(np.einsum('ij,ij->i', deltas, deltas)))))
+
+        # Оценка всех объектов одним проходом NumPy по столбцам (lat, lon, dist)
+        obj_arr = np.array([(obj[0], obj[1], obj[5]) for obj in unique_objects], dtype=np.float64).reshape(-1, 3)
+        lats, lons, dists = obj_arr[:, 0], obj_arr[:, 1], obj_arr[:, 2]
+        priority = priority_table[np.fromiter((obj[6] for obj in unique_objects), np.intp, len(unique_objects))]
+        # Бонус за близость к началу/концу: min и sqrt монотонны, поэтому берём
+        # меньший из квадратов расстояний и извлекаем один корень вместо двух
+        start_d2 = (lats - start_lat)**2 + (lons - start_lon)**2
+        end_d2 = (lats - end_lat)**2 + (lons - end_lon)**2
+        position_bonus = np.maximum(0, 0.001 - np.sqrt(np.minimum(start_d2, end_d2))) * 100000
+        distance_penalty = dists * 500000  # штраф за удаленность от маршрута
+        scores = priority * 1000 + position_bonus - distance_penalty
+        # Устойчивая сортировка по убыванию: при равной оценке сохраняется исходный порядок
+        best_objects = [unique_objects[i] for i in np.argsort(-scores, kind='stable')[:6].tolist()]
+
+        # Cumulative distance of each object along the route — параллельный массив route_pos
+        # (ближайшие вершины маршрута для всех объектов — один запрос к индексу), объекты не копируются
+        _, closest = route_index.nearest([obj[:2] for obj in best_objects])
+        route_pos = cum_dist[closest]
+        along = np.argsort(route_pos, kind='stable')  # sort by cumulative distance
+        best_objects = [best_objects[i] for i in along.tolist()]
+        route_pos = route_pos[along].tolist()
+
+        # Filter to ensure minimum distance along route to avoid close waypoints.
+        # Объекты уже упорядочены по route_pos, так что достаточно сравнить с последним принятым
         min_route_distance = 0.009  # ~1km along route
         filtered_objects = []
-        for obj in best_objects:
-            if not filtered_objects or all(abs(obj[6] - o[6]) > min_route_distance for o in filtered_objects):
+        last_pos = None
+        for obj, pos in zip(best_objects, route_pos):
+            if last_pos is None or pos - last_pos > min_route_distance:
                 filtered_objects.append(obj)
-        best_objects = filtered_objects[:3]  # limit to 3 waypoints max
+                last_pos = pos
+                if len(filtered_objects) == 3:  # limit to 3 waypoints max
+                    break
+        best_objects = filtered_objects
 
         # 5. Строим финальный маршрут: старт → лучшие объекты → финиш
         waypoints = [start_coords_tuple] + [(obj[0], obj[1]) for obj in best_objects] + [end_coords_tuple]
@@ -897,8 +1538,13 @@ class AccessibleNavigationSystem:
                 "longitude": lon
             })
 
-        # Строим маршрут через выбранные объекты одним запросом
-        final_route, full_data = self.osm.get_route_multi(waypoints)
+        # Строим маршрут через выбранные объекты одним запросом. Если объектов нет или все они
+        # лежат у самого маршрута (obj[5] — расстояние до ближайшей вершины), короткий маршрут
+        # уже проходит через них и второй запрос к OSRM не нужен
+        if best_objects and max(obj[5] for obj in best_objects) >= WAYPOINT_ON_ROUTE:
+            final_route, full_data = self.osm.get_route_multi(waypoints)
+        else:
+            final_route, full_data = base_route_coords, base_data
 
         if not final_route or full_data["distance"] > base_distance * 1.5:
             # Если крюк слишком большой или ошибка — возвращаем короткий маршрут
@@ -926,74 +1572,105 @@ class AccessibleNavigationSystem:
             "mobility_type": mobility_type.value
         }
 
+    def _pedestrian_bbox_tiles(self, coords):
+        """bbox точек, расширенный на 0.01° (~1 км), и клетки сетки, которые его покрывают"""
+        pts = np.asarray(coords, dtype=np.float64)
+        min_lat, min_lon = (pts.min(axis=0) - 0.01).tolist()
+        max_lat, max_lon = (pts.max(axis=0) + 0.01).tolist()
+        tiles = [(i, j)
+                 for i in range(math.floor(min_lat / OVERPASS_TILE), math.floor(max_lat / OVERPASS_TILE) + 1)
+                 for j in range(math.floor(min_lon / OVERPASS_TILE), math.floor(max_lon / OVERPASS_TILE) + 1)]
+        return (min_lat, min_lon, max_lat, max_lon), tiles
+
+    def _load_pedestrian_tiles(self, tiles):
+        missing = [tile for tile in tiles if self._pedestrian_tiles.get(tile) is None]
+        if missing:
+            self._fetch_pedestrian_tiles(missing)
+
+    def prefetch_pedestrian_tiles(self, coords):
+        """Загружает в кэш клетки вокруг концов маршрута, пока OSRM строит сам маршрут"""
+        self._load_pedestrian_tiles(self._pedestrian_bbox_tiles(coords)[1])
+
     def get_pedestrian_points_near_route(self, base_route_coords):
-        # Get bbox around route
-        lats = [p[0] for p in base_route_coords]
-        lons = [p[1] for p in base_route_coords]
-        min_lat, max_lat = min(lats), max(lats)
-        min_lon, max_lon = min(lons), max(lons)
-        # Expand by 0.01 degrees ~1km
-        min_lat -= 0.01
-        max_lat += 0.01
-        min_lon -= 0.01
-        max_lon += 0.01
-        # Overpass query for pedestrian ways
+        # Get bbox around route; клетки сетки берутся из кэша (соседние и повторные маршруты)
+        (min_lat, min_lon, max_lat, max_lon), tiles = self._pedestrian_bbox_tiles(base_route_coords)
+        self._load_pedestrian_tiles(tiles)
+        chunks = [self._pedestrian_tiles.get(tile) for tile in tiles]
+        chunks = [chunk for chunk in chunks if chunk is not None]
+        if not chunks:
+            # Fallback to random
+            return []
+        nodes = np.concatenate(chunks)
+        inside = ((nodes[:, 0] >= min_lat) & (nodes[:, 0] <= max_lat)
+                  & (nodes[:, 1] >= min_lon) & (nodes[:, 1] <= max_lon))
+        # Выбираем 50 индексов, а кортежи строим только для них, а не для всех узлов
+        candidates = np.flatnonzero(inside)
+        chosen = candidates[ROUTE_RNG.sample(range(len(candidates)), min(50, len(candidates)))]
+        return [tuple(p) for p in nodes[chosen].tolist()]
+
+    def _fetch_pedestrian_tiles(self, tiles):
+        """Один запрос Overpass на габарит недостающих клеток, узлы раскладываются по клеткам"""
+        lat_idx = [i for i, _ in tiles]
+        lon_idx = [j for _, j in tiles]
+        bbox = [round(v * OVERPASS_TILE, 6) for v in
+                (min(lat_idx), min(lon_idx), max(lat_idx) + 1, max(lon_idx) + 1)]
+        # Overpass query for pedestrian ways: skel — только геометрия, без тегов
         query = f"""
         [out:json];
-        way["highway"~"footway|pedestrian|path"]({min_lat},{min_lon},{max_lat},{max_lon});
-        out geom;
+        way["highway"~"footway|pedestrian|path"]({bbox[0]},{bbox[1]},{bbox[2]},{bbox[3]});
+        out skel geom qt;
         """
-        url = "https://overpass-api.de/api/interpreter"
         try:
-            response = requests.post(url, data=query, timeout=10)
-            data = response.json()
-            points = []
-            for way in data['elements']:
-                if 'geometry' in way:
-                    for geom in way['geometry']:
-                        points.append((geom['lat'], geom['lon']))
-            import random
-            sampled = random.sample(points, min(50, len(points)))
-            return sampled
-        except:
-            # Fallback to random
-            return []
-
-    def generate_accessibility_objects(self, base_route_coords, mobility_type):
-        import random
-        import math
+            with self.osm.session.post(OVERPASS_URL, data=query, timeout=10, stream=True) as response:
+                response.raise_for_status()
+                nodes = read_overpass_nodes(response)
+        except OVERPASS_ERRORS as e:
+            # Неудачу не кэшируем: следующий маршрут запросит эти клетки снова
+            print(f"Overpass ошибка: {e}")
+            return
+        keys = np.floor(nodes / OVERPASS_TILE).astype(np.int64)
+        for i, j in tiles:
+            self._pedestrian_tiles.set((i, j), nodes[(keys[:, 0] == i) & (keys[:, 1] == j)])
+
+    def generate_accessibility_objects(self, base_route_coords, mobility_type,
+                                       route_index: Optional[RouteIndex] = None):
         objects = []
         features = {
             MobilityType.WHEELCHAIR: ["пандус_стационарный", "пандус_откидной"],
             MobilityType.VISUALLY_IMPAIRED: ["тактильная_плитка_направляющая", "светофор_звуковой", "тактильная_плитка_предупреждающая", "кнопка_вызова"],
             MobilityType.CANE: ["поручни", "понижение_бордюра"]
         }.get(mobility_type, [])
+        # Тип выбирается вместе с его номером: приоритет потом берётся из массива, без поиска по строке
+        feature_choices = [(feature, FEATURE_IDS[feature]) for feature in features]
+        if route_index is None:
+            route_index = RouteIndex(base_route_coords)
         pedestrian_points = self.get_pedestrian_points_near_route(base_route_coords)
-        # Filter points within 500m of base_route
-        def dist_to_route(lat, lon):
-            return min(((lat - rlat)**2 + (lon - rlon)**2)**0.5 for rlat, rlon in base_route_coords)
-        filtered_points = [p for p in pedestrian_points if dist_to_route(p[0], p[1]) < 0.005]  # ~500m
+        # Filter points within 500m of base_route: расстояния до маршрута считаются
+        # одним запросом и используются дальше как obj_dist
+        route_dists = route_index.nearest(pedestrian_points)[0].tolist()
+        filtered_points = [(p, d) for p, d in zip(pedestrian_points, route_dists) if d < 0.005]  # ~500m
         if not filtered_points:
-            # Fallback
-            for lat, lon in base_route_coords[::20]:
-                for _ in range(2):
-                    dist_deg = random.uniform(0.001, 0.005)  # 100-500m
-                    angle = random.uniform(0, 2 * math.pi)
-                    new_lat = lat + dist_deg * math.cos(angle)
-                    new_lon = lon + dist_deg * math.sin(angle)
-                    feature = random.choice(features)
-                    description = f"Generated {feature.replace('_', ' ')}"
-                    address = f"Near pedestrian route at {new_lat:.4f}, {new_lon:.4f}"
-                    obj_dist = dist_to_route(new_lat, new_lon)
-                    obj = (new_lat, new_lon, feature, description, address, obj_dist)
-                    objects.append(obj)
+            # Fallback: по две случайные точки у каждой 20-й вершины маршрута. Случайные числа
+            # берутся в прежнем порядке, смещения и расстояния до маршрута считаются массивами
+            anchors = np.repeat(route_index.pts[::20], 2, axis=0)
+            draws = [(ROUTE_RNG.uniform(0.001, 0.005), ROUTE_RNG.uniform(0, 2 * math.pi), ROUTE_RNG.choice(feature_choices))
+                     for _ in range(len(anchors))]  # 100-500m
+            dist_deg = np.array([d[0] for d in draws])
+            angle = np.array([d[1] for d in draws])
+            new_coords = anchors + np.column_stack((dist_deg * np.cos(angle), dist_deg * np.sin(angle)))
+            generated_dists = route_index.nearest(new_coords)[0].tolist()
+            for (new_lat, new_lon), (_, _, (feature, feature_id)), obj_dist in zip(
+                    new_coords.tolist(), draws, generated_dists):
+                description = f"Generated {feature.replace('_', ' ')}"
+                address = f"Near pedestrian route at {new_lat:.4f}, {new_lon:.4f}"
+                obj = (new_lat, new_lon, feature, description, address, obj_dist, feature_id)
+                objects.append(obj)
         else:
-            for lat, lon in filtered_points[:20]:  # limit
-                feature = random.choice(features)
+            for (lat, lon), obj_dist in filtered_points[:20]:  # limit
+                feature, feature_id = ROUTE_RNG.choice(feature_choices)
                 description = f"Generated {feature.replace('_', ' ')} on pedestrian route"
                 address = f"On pedestrian route at {lat:.4f}, {lon:.4f}"
-                obj_dist = dist_to_route(lat, lon)
-                obj = (lat, lon, feature, description, address, obj_dist)
+                obj = (lat, lon, feature, description, address, obj_dist, feature_id)
                 objects.append(obj)
         return objects
 
@@ -1001,7 +1678,7 @@ class AccessibleNavigationSystem:
                                       distance_m: float, duration_min: int,
                                       objects: List[dict], mobility_type: MobilityType) -> str:
         extra = " (с учётом объектов доступности)" if objects else " (самый короткий)"
-        desc = f"""УМНЫЙ МАРШРУТ ДЛЯ {mobility_type.value.upper()}{extra}
+        parts = [f"""УМНЫЙ МАРШРУТ ДЛЯ {mobility_type.value.upper()}{extra}
 {'='*70}
 От: {start_addr}
 До: {end_addr}
@@ -1010,25 +1687,26 @@ class AccessibleNavigationSystem:
 
 КЛЮЧЕВЫЕ ОБЪЕКТЫ ДОСТУПНОСТИ НА МАРШРУТЕ:
 {'='*70}
-"""
+"""]
+        # Части собираются в список и склеиваются один раз, без промежуточных строк
         if not objects:
-            desc += "→ Маршрут оптимален. Объекты доступности поблизости не обнаружены.\n"
+            parts.append("→ Маршрут оптимален. Объекты доступности поблизости не обнаружены.\n")
         else:
             for i, obj in enumerate(objects, 1):
                 name = obj["feature_type"].replace('_', ' ').title()
-                desc += f"{i}. {name}\n   {obj['description']}\n   {obj['address']}\n\n"
-            desc += "→ Маршрут проходит через эти объекты для вашей безопасности и комфорта!\n"
+                parts.append(f"{i}. {name}\n   {obj['description']}\n   {obj['address']}\n\n")
+            parts.append("→ Маршрут проходит через эти объекты для вашей безопасности и комфорта!\n")
 
-        desc += "\nБезопасного пути! Вы делаете мир доступнее ♿"
-        return desc
+        parts.append("\nБезопасного пути! Вы делаете мир доступнее ♿")
+        return "".join(parts)
 
 
 # Flask веб-приложение
 try:
-    from flask import Flask, render_template, render_template_string, request, jsonify, redirect, url_for, send_from_directory, session, flash
+    from flask import Flask, Response, g, render_template, request, jsonify, redirect, url_for, send_from_directory, session, flash, get_flashed_messages
     from flask_cors import CORS
+    from markupsafe import escape
     from werkzeug.utils import secure_filename
-    from werkzeug.security import generate_password_hash, check_password_hash
     import os
     from xml_parser import XMLDataParser
 
@@ -1040,6 +1718,24 @@ try:
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     nav_system = AccessibleNavigationSystem()
 
+    # Пул для параллельных запросов подсказок (SQLite и OSM)
+    SUGGEST_EXECUTOR = ThreadPoolExecutor(max_workers=8)
+
+    # Запись загруженных фото на диск вне потока запроса
+    IO_EXECUTOR = ThreadPoolExecutor(max_workers=4)
+
+    # Готовые ответы подсказок по запросу в нижнем регистре
+    SUGGEST_CACHE = TTLCache(maxsize=1024, ttl=60)
+
+    # Ответы Nominatim кэширует nav_system.osm (память + geocode_cache); браузер держит адрес
+    # по координатам сутки
+    REVERSE_GEOCODE_MAX_AGE = 24 * 3600
+
+    # Адреса из БД в памяти: повторные префиксы при наборе не доходят до SQLite
+    ADDRESS_TRIE = AddressTrie()
+    for addr in nav_system.db.get_all_addresses():
+        ADDRESS_TRIE.insert(addr)
+
     # Load organizations and infrastructure
     parser = XMLDataParser()
     try:
@@ -1065,37 +1761,22 @@ try:
         <meta charset="UTF-8">
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
         <title>Доступная навигация</title>
+        <!-- Заранее открываем соединения с внешними хостами карты, пока разбирается страница -->
+        <link rel="preconnect" href="https://basemaps.cartocdn.com" crossorigin>
+        <link rel="preconnect" href="https://tiles.basemaps.cartocdn.com" crossorigin>
+        <link rel="preconnect" href="https://unpkg.com" crossorigin>
+        <link rel="dns-prefetch" href="https://overpass-api.de">
         <link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css" />
         <script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
+        <link rel="stylesheet" href="{{ asset_url('style.css') }}">
         <style>
-            * { margin: 0; padding: 0; box-sizing: border-box; }
-            body { 
-                font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                min-height: 100vh;
-                padding: 20px;
-            }
             .container {
                 max-width: 1400px;
-                margin: 0 auto;
-                background: white;
-                border-radius: 20px;
-                box-shadow: 0 20px 60px rgba(0,0,0,0.3);
-                overflow: hidden;
                 position: relative;
             }
-            .header {
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                color: white;
-                padding: 30px;
-                text-align: center;
-            }
-            .header h1 { font-size: 2.5em; margin-bottom: 10px; }
-            .header p { font-size: 1.2em; opacity: 0.9; }
             .header .links { margin-top: 20px; }
             .header .links a { color: white; margin: 0 10px; text-decoration: none; }
             .header .links a[href="/admin/districts_folium"] { background: rgba(255,255,255,0.2); padding: 5px 10px; border-radius: 5px; }
-            .accessibility-buttons { margin-top: 20px; }
             .btn-accessibility {
                 background: rgba(255,255,255,0.2);
                 border: 1px solid rgba(255,255,255,0.3);
@@ -1126,25 +1807,9 @@ try:
             .btn-accessibility:hover {
                 background: rgba(255,255,255,0.3);
             }
-            .high-contrast {
-                background: #000 !important;
-                color: #fff !important;
-            }
             .high-contrast .sidebar {
                 background: #111 !important;
             }
-            .high-contrast .form-group label {
-                color: #fff !important;
-            }
-            .high-contrast input, .high-contrast select {
-                background: #333 !important;
-                color: #fff !important;
-                border-color: #fff !important;
-            }
-            .high-contrast .btn {
-                background: #fff !important;
-                color: #000 !important;
-            }
             .high-contrast .route-info {
                 background: #333 !important;
                 color: #fff !important;
@@ -1168,27 +1833,6 @@ try:
                 border-right: 2px solid #f0f0f0;
                 background: #fafafa;
             }
-            .form-group {
-                margin-bottom: 20px;
-            }
-            .form-group label {
-                display: block;
-                margin-bottom: 8px;
-                font-weight: 600;
-                color: #333;
-            }
-            .form-group input, .form-group select {
-                width: 100%;
-                padding: 12px;
-                border: 2px solid #e0e0e0;
-                border-radius: 8px;
-                font-size: 1em;
-                transition: border-color 0.3s;
-            }
-            .form-group input:focus, .form-group select:focus {
-                outline: none;
-                border-color: #667eea;
-            }
             .btn {
                 width: auto;
                 padding: 15px;
@@ -1201,26 +1845,6 @@ try:
                 flex: 1;
                 min-width: 200px;
             }
-            .button-row {
-                display: flex;
-                gap: 10px;
-                flex-wrap: wrap;
-            }
-            .btn-primary {
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                color: white;
-            }
-            .btn-primary:hover {
-                transform: translateY(-2px);
-                box-shadow: 0 5px 15px rgba(102, 126, 234, 0.4);
-            }
-            .btn-secondary {
-                background: #f0f0f0;
-                color: #333;
-            }
-            .btn-secondary:hover {
-                background: #e0e0e0;
-            }
             .btn-voice {
                 background: linear-gradient(135deg, #f093fb 0%, #f5576c 100%);
                 color: white;
@@ -1256,6 +1880,38 @@ try:
                 color: #667eea;
             }
             .loading.active { display: block; }
+            #notification {
+                display: none; position: fixed; bottom: 20px; left: 50%; transform: translateX(-50%);
+                padding: 20px; z-index: 2000; border-radius: 10px; box-shadow: 0 0 10px rgba(0,0,0,0.5);
+                background: linear-gradient(135deg, #667eea, #764ba2); color: white;
+                font-size: 16px; font-weight: bold;
+            }
+            #notification.show { display: block; }
+            /* Подсказки адресов */
+            .suggestions {
+                position: absolute;
+                top: 100%;
+                left: 0;
+                right: 0;
+                background: white;
+                border: 1px solid #ccc;
+                max-height: 200px;
+                overflow-y: auto;
+                z-index: 1000;
+                display: none;
+                box-shadow: 0 4px 10px rgba(0,0,0,0.1);
+                border-radius: 8px;
+                margin-top: 4px;
+            }
+            .suggestions div {
+                padding: 12px;
+                cursor: pointer;
+                border-bottom: 1px solid #eee;
+            }
+            .suggestions div:hover, .suggestions div.active {
+                background: #667eea;
+                color: white;
+            }
             .spinner {
                 border: 4px solid #f3f3f3;
                 border-top: 4px solid #667eea;
@@ -1355,7 +2011,7 @@ try:
                             <label for="startAddress">
                                 <span class="icon">📍</span>Откуда
                             </label>
-                            <input type="text" id="startAddress" placeholder="Введите адрес или 'текущий'" required title="Введите адрес отправления или 'текущий' для использования геолокации">
+                            <input type="text" id="startAddress" data-voice-label="Откуда" placeholder="Введите адрес или 'текущий'" required title="Введите адрес отправления или 'текущий' для использования геолокации">
                             <div class="geolocation-status" id="geoStatus"></div>
                         </div>
                         
@@ -1363,7 +2019,7 @@ try:
                             <label for="endAddress">
                                 <span class="icon">🎯</span>Куда
                             </label>
-                            <input type="text" id="endAddress" list="destinations" placeholder="Введите адрес или выберите организацию" required title="Введите адрес назначения или выберите организацию из списка">
+                            <input type="text" id="endAddress" data-voice-label="Куда" list="destinations" placeholder="Введите адрес или выберите организацию" required title="Введите адрес назначения или выберите организацию из списка">
                             <datalist id="destinations"></datalist>
                         </div>
                         
@@ -1371,7 +2027,7 @@ try:
                             <label for="mobilityType">
                                 <span class="icon">👤</span>Тип ограничений
                             </label>
-                            <select id="mobilityType" required title="Выберите тип ограничений мобильности">
+                            <select id="mobilityType" data-voice-label="Тип ограничений" required title="Выберите тип ограничений мобильности">
                                 <option value="колясочник">♿ Колясочник</option>
                                 <option value="слабовидящий">👓 Слабовидящий</option>
                                 <option value="опора на трость">🦯 Опора на трость</option>
@@ -1415,7 +2071,7 @@ try:
             </div>
 
             <!-- Notification -->
-            <div id="notification" style="display:none; position:fixed; bottom:20px; left:50%; transform:translateX(-50%); background:white; padding:20px; border:1px solid black; z-index:2000; border-radius:10px; box-shadow:0 0 10px rgba(0,0,0,0.5);"></div>
+            <div id="notification"></div>
 
             <!-- Video Modal -->
             <div id="videoModal" class="modal">
@@ -1435,12 +2091,8 @@ try:
         <script src="https://code.jquery.com/jquery-3.6.0.min.js"></script>
         <audio id="bgMusic" preload="auto"></audio>
 
+        <script src="{{ asset_url('app.js') }}"></script>
         <script>
-            // Initialize speech synthesis
-            if ('speechSynthesis' in window) {
-                speechSynthesis.getVoices(); // Load voices
-            }
-
             // Инициализация MapLibre GL JS
             const map = new maplibregl.Map({
                 container: 'map',
@@ -1463,8 +2115,9 @@ try:
             const pngElements = ['png1', 'png2', 'png3'];
 
             pngElements.forEach(id => {
-                document.getElementById(id).addEventListener('click', () => {
-                    document.getElementById(id).style.display = 'none';
+                const png = document.getElementById(id);
+                png.addEventListener('click', () => {
+                    png.style.display = 'none';
                     pngClicked++;
                     const remaining = totalPng - pngClicked;
 
@@ -1482,11 +2135,96 @@ try:
 
             let routeLayer = null;
             let routeSource = null;
-            let accessibilityMarkers = [];
             let startMarker = null;
             let endMarker = null;
             let userLocationMarker = null;
-            let addressMarkers = [];
+
+            // Объекты доступности и адреса рисуются WebGL-слоями из GeoJSON-источников,
+            // а не DOM-маркерами: при панорамировании не двигаются сотни узлов DOM
+            const EMPTY_POINTS = { type: 'FeatureCollection', features: [] };
+            const FEATURE_COLORS = {
+                'пандус_стационарный': '#3b82f6', 'лифт': '#8b5cf6', 'широкая_дверь': '#ec4899',
+                'доступная_парковка': '#06b6d4', 'тактильная_плитка_направляющая': '#f97316',
+                'светофор_звуковой': '#10b981', 'поручни': '#a16207', 'понижение_бордюра': '#84cc16'
+            };
+            const FEATURE_COLOR_EXPR = ['match', ['get', 'ft'], ...Object.entries(FEATURE_COLORS).flat(), '#6b7280'];
+
+            // Один всплывающий блок на все точки слоёв: при клике меняются только координаты и текст.
+            // Закрывается общим обработчиком клика по карте, который срабатывает раньше обработчиков слоёв
+            const sharedPopup = new maplibregl.Popup({ offset: 12, closeOnClick: false });
+            function showPopup(lngLat, html) {
+                sharedPopup.setLngLat(lngLat).setHTML(html).addTo(map);
+            }
+
+            // Подписи типов объектов ('широкая_дверь' → 'Широкая Дверь') считаются один раз на тип
+            const LABEL_CACHE = new Map();
+            function labelOf(type) {
+                let label = LABEL_CACHE.get(type);
+                if (label === undefined) {
+                    label = type.replace(/_/g, ' ').replace(/\b\w/g, l => l.toUpperCase());
+                    LABEL_CACHE.set(type, label);
+                }
+                return label;
+            }
+
+            function pointCollection(items, toPoint) {
+                return {
+                    type: 'FeatureCollection',
+                    features: items.map(item => {
+                        const [coordinates, properties] = toPoint(item);
+                        return { type: 'Feature', geometry: { type: 'Point', coordinates }, properties };
+                    })
+                };
+            }
+
+            function setPoints(sourceId, collection) {
+                const source = map.getSource(sourceId);
+                if (source) source.setData(collection);
+            }
+
+            function addPointLayers() {
+                map.addSource('access', { type: 'geojson', data: EMPTY_POINTS, cluster: true, clusterRadius: 50, clusterMaxZoom: 14 });
+                map.addLayer({
+                    id: 'access-clusters', type: 'circle', source: 'access', filter: ['has', 'point_count'],
+                    paint: {
+                        'circle-color': '#667eea', 'circle-opacity': 0.85,
+                        'circle-radius': ['step', ['get', 'point_count'], 14, 10, 18, 50, 24],
+                        'circle-stroke-width': 2, 'circle-stroke-color': '#fff'
+                    }
+                });
+                map.addLayer({
+                    id: 'access', type: 'circle', source: 'access', filter: ['!', ['has', 'point_count']],
+                    paint: { 'circle-color': FEATURE_COLOR_EXPR, 'circle-radius': 9, 'circle-stroke-width': 2, 'circle-stroke-color': '#fff' }
+                });
+                map.addSource('addresses', { type: 'geojson', data: EMPTY_POINTS });
+                map.addLayer({
+                    id: 'addresses', type: 'circle', source: 'addresses',
+                    paint: { 'circle-color': '#888', 'circle-radius': 6, 'circle-stroke-width': 1, 'circle-stroke-color': '#fff' }
+                });
+
+                map.on('click', () => sharedPopup.remove());
+                map.on('click', 'access', e => {
+                    const p = e.features[0].properties;
+                    showPopup(e.features[0].geometry.coordinates, `
+                        <b>${labelOf(p.ft)}</b><br>
+                        ${p.desc}<br><small><i>${p.addr}</i></small>
+                    `);
+                });
+                // Клик по кластеру приближает карту до уровня, где он распадается
+                map.on('click', 'access-clusters', e => {
+                    const cluster = e.features[0];
+                    map.getSource('access').getClusterExpansionZoom(cluster.properties.cluster_id, (err, zoom) => {
+                        if (!err) map.easeTo({ center: cluster.geometry.coordinates, zoom });
+                    });
+                });
+                map.on('click', 'addresses', e => {
+                    showPopup(e.features[0].geometry.coordinates, `<b>Адрес:</b><br>${e.features[0].properties.address}`);
+                });
+                ['access', 'access-clusters', 'addresses'].forEach(id => {
+                    map.on('mouseenter', id, () => { map.getCanvas().style.cursor = 'pointer'; });
+                    map.on('mouseleave', id, () => { map.getCanvas().style.cursor = ''; });
+                });
+            }
 
             // Полная очистка карты
             function clearMapCompletely() {
@@ -1494,11 +2232,9 @@ try:
                 if (routeSource && map.getSource('route')) map.removeSource('route');
                 routeLayer = routeSource = null;
 
-                accessibilityMarkers.forEach(m => m.remove());
-                accessibilityMarkers = [];
-
-                addressMarkers.forEach(m => m.remove());
-                addressMarkers = [];
+                sharedPopup.remove();
+                setPoints('access', EMPTY_POINTS);
+                hideAddresses();
 
                 if (startMarker) startMarker.remove();
                 if (endMarker) endMarker.remove();
@@ -1511,18 +2247,30 @@ try:
             function displayRoute(data) {
                 clearMapCompletely();
 
-                const coords = data.route_coords.map(c => [c[1], c[0]]);
+                // Перестановка в [lon, lat] и границы маршрута за один проход
+                const n = data.route_coords.length;
+                const coords = new Array(n);
+                let minLon = Infinity, minLat = Infinity, maxLon = -Infinity, maxLat = -Infinity;
+                for (let i = 0; i < n; i++) {
+                    const lat = data.route_coords[i][0], lon = data.route_coords[i][1];
+                    coords[i] = [lon, lat];
+                    if (lon < minLon) minLon = lon;
+                    if (lon > maxLon) maxLon = lon;
+                    if (lat < minLat) minLat = lat;
+                    if (lat > maxLat) maxLat = lat;
+                }
 
                 map.addSource('route', {
                     type: 'geojson',
                     data: { type: 'Feature', geometry: { type: 'LineString', coordinates: coords } }
                 });
+                // Линия маршрута под точками объектов
                 map.addLayer({
                     id: 'route',
                     type: 'line',
                     source: 'route',
                     paint: { 'line-color': '#667eea', 'line-width': 7, 'line-opacity': 0.9 }
-                });
+                }, map.getLayer('access-clusters') ? 'access-clusters' : undefined);
                 routeSource = 'route';
                 routeLayer = 'route';
 
@@ -1537,27 +2285,13 @@ try:
                     .setPopup(new maplibregl.Popup().setHTML(`<b>Финиш</b><br>${data.end.address}`))
                     .addTo(map);
 
-                // Объекты доступности
-                const colorMap = {
-                    'пандус_стационарный': '#3b82f6', 'лифт': '#8b5cf6', 'широкая_дверь': '#ec4899',
-                    'доступная_парковка': '#06b6d4', 'тактильная_плитка_направляющая': '#f97316',
-                    'светофор_звуковой': '#10b981', 'поручни': '#a16207', 'понижение_бордюра': '#84cc16'
-                };
-
-                data.accessibility_objects.forEach(obj => {
-                    const marker = new maplibregl.Marker({ color: colorMap[obj.feature_type] || '#6b7280' })
-                        .setLngLat([obj.longitude, obj.latitude])
-                        .setPopup(new maplibregl.Popup({ offset: 25 }).setHTML(`
-                            <b>${obj.feature_type.replace(/_/g, ' ').replace(/\b\w/g, l => l.toUpperCase())}</b><br>
-                            ${obj.description}<br><small><i>${obj.address}</i></small>
-                        `))
-                        .addTo(map);
-                    accessibilityMarkers.push(marker);
-                });
+                // Объекты доступности — одно обновление GeoJSON-источника
+                setPoints('access', pointCollection(data.accessibility_objects, obj => [
+                    [obj.longitude, obj.latitude],
+                    { ft: obj.feature_type, desc: obj.description, addr: obj.address }
+                ]));
 
-                const bounds = new maplibregl.LngLatBounds(coords[0], coords[0]);
-                coords.forEach(c => bounds.extend(c));
-                map.fitBounds(bounds, { padding: 100, duration: 2000 });
+                map.fitBounds([[minLon, minLat], [maxLon, maxLat]], { padding: 100, duration: 800 });
             }
 
             // === АВТОДОПОЛНЕНИЕ ДЛЯ startAddress ===
@@ -1574,77 +2308,87 @@ try:
             endInput.parentNode.style.position = 'relative';
             endInput.parentNode.appendChild(endSuggestions);
 
-            // Стили для подсказок
-            const style = document.createElement('style');
-            style.textContent = `
-                .suggestions {
-                    position: absolute;
-                    top: 100%;
-                    left: 0;
-                    right: 0;
-                    background: white;
-                    border: 1px solid #ccc;
-                    max-height: 200px;
-                    overflow-y: auto;
-                    z-index: 1000;
-                    display: none;
-                    box-shadow: 0 4px 10px rgba(0,0,0,0.1);
-                    border-radius: 8px;
-                    margin-top: 4px;
-                }
-                .suggestions div {
-                    padding: 12px;
-                    cursor: pointer;
-                    border-bottom: 1px solid #eee;
-                }
-                .suggestions div:hover, .suggestions div.active {
-                    background: #667eea;
-                    color: white;
+            // Элементы, к которым обращаются обработчики событий
+            const mobilityType = document.getElementById('mobilityType');
+            const loadingEl = document.getElementById('loading');
+            const routeDesc = document.getElementById('routeDescription');
+            const routeInfoEl = document.getElementById('routeInfo');
+            const routeVoiceBtn = document.getElementById('routeVoiceBtn');
+            const geoStatus = document.getElementById('geoStatus');
+            const useLocationBtn = document.getElementById('useLocationBtn');
+            const routeForm = document.getElementById('routeForm');
+            const contrastBtn = document.getElementById('contrastBtn');
+            const elementVoiceBtn = document.getElementById('elementVoiceBtn');
+            const notificationEl = document.getElementById('notification');
+            const videoModal = document.getElementById('videoModal');
+            const samovarVideo = document.getElementById('samovarVideo');
+            const bgMusic = document.getElementById('bgMusic');
+
+            function renderSuggestions(box, suggestions) {
+                if (suggestions.length === 0) {
+                    box.replaceChildren();
+                    box.style.display = 'none';
+                    return;
                 }
-            `;
-            document.head.appendChild(style);
 
-            // Универсальная функция автодополнения
-            async function showSuggestions(input, box) {
-                const query = input.value.trim();
+                // Строки собираются во фрагменте и вставляются одной операцией
+                const frag = document.createDocumentFragment();
+                suggestions.forEach(s => {
+                    const div = document.createElement('div');
+                    div.textContent = s;
+                    frag.appendChild(div);
+                });
+                box.replaceChildren(frag);
+
+                box.style.display = 'block';
+            }
+
+            // Универсальная функция автодополнения: запрос с задержкой и отменой через suggester поля
+            function showSuggestions(input, box, suggester) {
+                const query = input.value.trim().toLowerCase();
                 if (query.length < 2) {
+                    suggester.cancel();
                     box.style.display = 'none';
                     return;
                 }
+                suggester.request(query);
+            }
 
-                try {
-                    const res = await fetch(`/api/suggest_address?q=${encodeURIComponent(query)}`);
-                    const suggestions = await res.json();
-
-                    box.innerHTML = '';
-                    if (suggestions.length === 0) {
-                        box.style.display = 'none';
-                        return;
-                    }
-
-                    suggestions.forEach((s, i) => {
-                        const div = document.createElement('div');
-                        div.textContent = s;
-                        div.onclick = () => {
-                            input.value = s;
-                            box.style.display = 'none';
-                        };
-                        div.onmouseover = () => {
-                            box.querySelectorAll('div').forEach(d => d.classList.remove('active'));
-                            div.classList.add('active');
-                        };
-                        box.appendChild(div);
-                    });
+            // Видимая область карты для подсказок, расширенная наружу до сотых градуса (~1 км):
+            // мелкие сдвиги карты не сбрасывают кэш подсказок
+            function suggestionBbox() {
+                const b = map.getBounds();
+                return [
+                    Math.floor(b.getWest() * 100), Math.floor(b.getSouth() * 100),
+                    Math.ceil(b.getEast() * 100), Math.ceil(b.getNorth() * 100)
+                ].map(v => (v / 100).toFixed(2)).join(',');
+            }
 
-                    box.style.display = 'block';
-                } catch (err) {
+            // Клик и наведение на подсказки обрабатываются одним listener'ом на весь список
+            function bindSuggestionBox(input, box) {
+                const suggester = createSuggester(
+                    suggestions => renderSuggestions(box, suggestions),
+                    () => { box.style.display = 'none'; },
+                    suggestionBbox
+                );
+                input.addEventListener('input', () => showSuggestions(input, box, suggester));
+                // Живая коллекция выделенных подсказок вместо querySelectorAll на каждое наведение
+                const activeItems = box.getElementsByClassName('active');
+                box.addEventListener('click', e => {
+                    if (e.target.parentNode !== box) return;
+                    input.value = e.target.textContent;
                     box.style.display = 'none';
-                }
+                });
+                box.addEventListener('mouseover', e => {
+                    if (e.target.parentNode !== box) return;
+                    while (activeItems.length) activeItems[0].classList.remove('active');
+                    e.target.classList.add('active');
+                });
             }
 
             // Обработчики
-            startInput.addEventListener('input', () => showSuggestions(startInput, startSuggestions));
-            endInput.addEventListener('input', () => showSuggestions(endInput, endSuggestions));
+            bindSuggestionBox(startInput, startSuggestions);
+            bindSuggestionBox(endInput, endSuggestions);
 
             // Скрытие при клике вне
             document.addEventListener('click', e => {
@@ -1657,7 +2401,7 @@ try:
             });
 
             // Геолокация
-            document.getElementById('useLocationBtn').addEventListener('click', () => {
+            useLocationBtn.addEventListener('click', () => {
                 navigator.geolocation.getCurrentPosition(async pos => {
                     const lat = pos.coords.latitude;
                     const lon = pos.coords.longitude;
@@ -1668,28 +2412,28 @@ try:
                         .setPopup(new maplibregl.Popup().setHTML('<b>Вы здесь</b>'))
                         .addTo(map);
 
-                    document.getElementById('startAddress').value = 'current';
-                    document.getElementById('geoStatus').innerHTML = `Геолокация: ±${pos.coords.accuracy.toFixed(0)} м`;
-                    document.getElementById('geoStatus').style.color = 'green';
+                    startInput.value = 'current';
+                    geoStatus.innerHTML = `Геолокация: ±${pos.coords.accuracy.toFixed(0)} м`;
+                    geoStatus.style.color = 'green';
                     map.flyTo({ center: [lon, lat], zoom: 16 });
                 }, () => {
-                    document.getElementById('geoStatus').textContent = 'Геолокация недоступна';
-                    document.getElementById('geoStatus').style.color = 'red';
+                    geoStatus.textContent = 'Геолокация недоступна';
+                    geoStatus.style.color = 'red';
                 });
             });
 
             // Построение маршрута
-            document.getElementById('routeForm').addEventListener('submit', async e => {
+            routeForm.addEventListener('submit', async e => {
                 e.preventDefault();
                 clearMapCompletely();
 
                 const payload = {
-                    start_address: document.getElementById('startAddress').value,
-                    end_address: document.getElementById('endAddress').value,
-                    mobility_type: document.getElementById('mobilityType').value
+                    start_address: startInput.value,
+                    end_address: endInput.value,
+                    mobility_type: mobilityType.value
                 };
 
-                document.getElementById('loading').classList.add('active');
+                loadingEl.classList.add('active');
 
                 try {
                     const res = await fetch('/api/route', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(payload) });
@@ -1698,24 +2442,24 @@ try:
                     if (data.success) {
                         currentRoute = data;
                         displayRoute(data);
-                        document.getElementById('routeDescription').textContent = data.description;
-                        document.getElementById('routeInfo').style.display = 'block';
-                        document.getElementById('routeVoiceBtn').style.display = 'inline-block';
+                        routeDesc.textContent = data.description;
+                        routeInfoEl.style.display = 'block';
+                        routeVoiceBtn.style.display = 'inline-block';
                     } else {
                         alert('Ошибка: ' + (data.error || 'Неизвестная ошибка'));
-                        document.getElementById('routeVoiceBtn').style.display = 'none';
+                        routeVoiceBtn.style.display = 'none';
                     }
                 } catch (err) {
                     alert('Сервер недоступен');
                 } finally {
-                    document.getElementById('loading').classList.remove('active');
+                    loadingEl.classList.remove('active');
                 }
             });
 
             // Клик на карте для выбора адреса
             let selectedInput = null;
-            document.getElementById('startAddress').addEventListener('focus', () => selectedInput = 'start');
-            document.getElementById('endAddress').addEventListener('focus', () => selectedInput = 'end');
+            startInput.addEventListener('focus', () => selectedInput = 'start');
+            endInput.addEventListener('focus', () => selectedInput = 'end');
 
             map.on('click', async (e) => {
                 if (!selectedInput) return;
@@ -1724,7 +2468,7 @@ try:
                     const res = await fetch(`/api/reverse_geocode?lat=${lat}&lon=${lng}`);
                     const data = await res.json();
                     if (data.address) {
-                        document.getElementById(selectedInput === 'start' ? 'startAddress' : 'endAddress').value = data.address;
+                        (selectedInput === 'start' ? startInput : endInput).value = data.address;
                         selectedInput = null;
                     }
                 } catch (err) {
@@ -1737,10 +2481,10 @@ try:
             let highContrast = false;
             let largeFont = false;
 
-            document.getElementById('elementVoiceBtn').addEventListener('click', () => {
+            elementVoiceBtn.addEventListener('click', () => {
                 elementVoiceMode = !elementVoiceMode;
-                document.getElementById('elementVoiceBtn').textContent = elementVoiceMode ? '🔊 Выключить озвучивание' : '🔊 Озвучивание элементов';
-                document.getElementById('elementVoiceBtn').classList.toggle('active', elementVoiceMode);
+                elementVoiceBtn.textContent = elementVoiceMode ? '🔊 Выключить озвучивание' : '🔊 Озвучивание элементов';
+                elementVoiceBtn.classList.toggle('active', elementVoiceMode);
                 if (elementVoiceMode) {
                     speakText('Озвучивание элементов включено');
                 } else {
@@ -1748,71 +2492,87 @@ try:
                 }
             });
 
-            document.getElementById('contrastBtn').addEventListener('click', () => {
+            contrastBtn.addEventListener('click', () => {
                 highContrast = !highContrast;
                 document.body.classList.toggle('high-contrast', highContrast);
-                document.getElementById('contrastBtn').classList.toggle('active', highContrast);
+                contrastBtn.classList.toggle('active', highContrast);
             });
 
-            // Функция озвучивания с более человеческим голосом
+            // Неизменные фразы интерфейса известны заранее
+            const ROUTE_FAREWELL = "Приятного и безопасного пути!";
+            const INTERFACE_PHRASES = [
+                "Доступная навигация для людей с ограниченными возможностями",
+                "Поле откуда - введите начальный адрес или нажмите для выбора на карте",
+                "Поле куда - введите конечный адрес или выберите организацию",
+                "Выберите тип ограничений мобильности: колясочник, слабовидящий, или опора на трость",
+                "Кнопка Построить маршрут",
+                "Кнопка Использовать мою геолокацию",
+                "Кнопка Добавить объект доступности",
+                "Кнопка Озвучить маршрут - доступна после построения маршрута",
+                "Карта - кликните для выбора адреса"
+            ];
+            const STATIC_PHRASES = [
+                ROUTE_FAREWELL,
+                'Озвучивание элементов включено',
+                'Озвучивание элементов выключено',
+                ...INTERFACE_PHRASES
+            ];
+
+            // Заранее подготовленные фразы: текст -> SpeechSynthesisUtterance
+            const ttsCache = new Map();
+
+            function preloadPhrases() {
+                if (!('speechSynthesis' in window)) return;
+                STATIC_PHRASES.forEach(text => ttsCache.set(text, configureUtterance(new SpeechSynthesisUtterance(), text)));
+            }
+
+            function getUtterance(text) {
+                const utter = ttsCache.get(text);
+                if (!utter) return makeUtterance(text);
+                // Голоса в Chrome приходят после загрузки карты (onvoiceschanged): берём текущий
+                utter.voice = CACHED_RU_VOICE;
+                return utter;
+            }
+
+            // Функция озвучивания
             function speakText(text, callback = null) {
                 if (!('speechSynthesis' in window)) return;
-                // Убираем эмодзи из текста
-                text = text.replace(/[\u{1F600}-\u{1F64F}]|[\u{1F300}-\u{1F5FF}]|[\u{1F680}-\u{1F6FF}]|[\u{1F1E0}-\u{1F1FF}]|[\u{2600}-\u{26FF}]|[\u{2700}-\u{27BF}]/gu, '');
-                const utter = new SpeechSynthesisUtterance(text);
-                utter.lang = 'ru-RU';
-                utter.rate = 0.9;  // Более естественная скорость
-                utter.pitch = 0.9; // Более низкая высота для мужского голоса
-                utter.volume = 0.9;
-                // Попытка выбрать мужской русский голос
-                const voices = speechSynthesis.getVoices();
-                const russianVoice = voices.find(v => v.lang.startsWith('ru') && (v.name.includes('Male') || v.name.includes('мужской') || !v.name.includes('Female')));
-                if (russianVoice) utter.voice = russianVoice;
-                if (callback) utter.onend = callback;
+                cancelPendingSpeech();
+                const utter = getUtterance(text);
+                utter.onend = callback;
                 speechSynthesis.speak(utter);
             }
 
+            // Озвучка списка фраз: все фразы сразу ставятся в очередь speechSynthesis,
+            // чтобы движок готовил следующую, пока звучит текущая
+            function speakAll(texts) {
+                if (!('speechSynthesis' in window)) return;
+                cancelPendingSpeech();
+                speechSynthesis.cancel();
+                const utterances = texts.map(getUtterance);
+                for (const utter of utterances) {
+                    utter.onend = null;
+                    speechSynthesis.speak(utter);
+                }
+            }
+
             // Озвучка маршрута
             function announceRoute() {
                 if (!currentRoute) return;
-                speechSynthesis.cancel();
-                const texts = [
+                speakAll([
                     `Маршрут от ${currentRoute.start.address} до ${currentRoute.end.address}`,
                     `Общая длина: ${currentRoute.total_distance} метров. Примерное время в пути: ${currentRoute.duration_minutes} минут`,
-                    ...currentRoute.accessibility_objects.map(o => `${o.feature_type.replace(/_/g, ' ').replace(/\b\w/g, l => l.toUpperCase())}: ${o.description}`),
-                    "Приятного и безопасного пути!"
-                ];
-                let i = 0;
-                const speakNext = () => {
-                    if (i >= texts.length) return;
-                    speakText(texts[i++], speakNext);
-                };
-                speakNext();
+                    ...currentRoute.accessibility_objects.map(o => `${labelOf(o.feature_type)}: ${o.description}`),
+                    ROUTE_FAREWELL
+                ]);
             }
 
             // Озвучка интерфейса для слабовидящих
             function announceInterface() {
-                speechSynthesis.cancel();
-                const elements = [
-                    "Доступная навигация для людей с ограниченными возможностями",
-                    "Поле откуда - введите начальный адрес или нажмите для выбора на карте",
-                    "Поле куда - введите конечный адрес или выберите организацию",
-                    "Выберите тип ограничений мобильности: колясочник, слабовидящий, или опора на трость",
-                    "Кнопка Построить маршрут",
-                    "Кнопка Использовать мою геолокацию",
-                    "Кнопка Добавить объект доступности",
-                    "Кнопка Озвучить маршрут - доступна после построения маршрута",
-                    "Карта - кликните для выбора адреса"
-                ];
-                let i = 0;
-                const speakNext = () => {
-                    if (i >= elements.length) return;
-                    speakText(elements[i++], speakNext);
-                };
-                speakNext();
+                speakAll(INTERFACE_PHRASES);
             }
 
-            document.getElementById('routeVoiceBtn').addEventListener('click', () => {
+            routeVoiceBtn.addEventListener('click', () => {
                 if (!currentRoute) return;
                 announceRoute();
             });
@@ -1822,7 +2582,8 @@ try:
                 if (!elementVoiceMode || !('speechSynthesis' in window)) return;
                 let text = '';
                 if (element.tagName === 'INPUT' || element.tagName === 'SELECT' || element.tagName === 'TEXTAREA') {
-                    const label = element.previousElementSibling ? element.previousElementSibling.textContent.trim() : element.placeholder || element.getAttribute('title') || 'Поле ввода';
+                    // Подпись заранее задана в data-voice-label, без обхода DOM на каждый фокус
+                    const label = element.dataset.voiceLabel || element.placeholder || element.getAttribute('title') || 'Поле ввода';
                     text = label;
                     if (eventType === 'change' && element.tagName === 'SELECT') {
                         const selected = element.options[element.selectedIndex].text;
@@ -1831,113 +2592,156 @@ try:
                 } else if (element.tagName === 'BUTTON') {
                     text = element.textContent.replace(/[^\w\sа-яё]/gi, '').trim() || element.getAttribute('title') || 'Кнопка';
                 }
-                if (text) {
-                    speechSynthesis.speak(new SpeechSynthesisUtterance(text));
+                if (!text) return;
+                if (eventType === 'click') {
+                    speechSynthesis.speak(makeUtterance(text));
+                } else {
+                    speakLatest(text);
                 }
             }
 
-            // Добавляем listeners ко всем интерактивным элементам
-            document.querySelectorAll('input, select, textarea, button').forEach(el => {
-                el.addEventListener('focus', () => announceElement(el, 'focus'));
-                if (el.tagName === 'SELECT') {
-                    el.addEventListener('change', () => announceElement(el, 'change'));
-                }
-                if (el.tagName === 'BUTTON') {
-                    el.addEventListener('click', () => announceElement(el, 'click'));
-                }
+            // Один делегированный listener на документ вместо listeners на каждом элементе;
+            // покрывает и элементы, добавленные позже
+            document.addEventListener('focusin', e => {
+                if (elementVoiceMode && e.target.matches('input, select, textarea, button')) announceElement(e.target, 'focus');
+            });
+            document.addEventListener('change', e => {
+                if (elementVoiceMode && e.target.tagName === 'SELECT') announceElement(e.target, 'change');
+            });
+            document.addEventListener('click', e => {
+                if (!elementVoiceMode) return;
+                const button = e.target.closest('button');
+                if (button) announceElement(button, 'click');
             });
 
             // Показать адреса домов
-            async function showAddresses() {
+            // После нажатия «Показать адреса» слой следует за картой: новый запрос к Overpass
+            // только если центр сместился больше чем на 200 м или масштаб изменился на уровень,
+            // незавершённый запрос отменяется
+            const ADDRESS_REFETCH_METERS = 200;
+            const ADDRESS_REFETCH_DELAY_MS = 400;
+            let addressesShown = false;
+            let addressesView = null;
+            let addressesCtrl = null;
+            let addressesTimer = null;
+
+            function addressesViewChanged() {
+                if (!addressesView) return true;
+                return map.getCenter().distanceTo(addressesView.center) > ADDRESS_REFETCH_METERS
+                    || Math.abs(map.getZoom() - addressesView.zoom) >= 1;
+            }
+
+            function hideAddresses() {
+                addressesShown = false;
+                addressesView = null;
+                clearTimeout(addressesTimer);
+                if (addressesCtrl) addressesCtrl.abort();
+                addressesCtrl = null;
+                setPoints('addresses', EMPTY_POINTS);
+            }
+
+            async function loadAddresses() {
+                if (addressesCtrl) addressesCtrl.abort();
+                const ctrl = addressesCtrl = new AbortController();
+                addressesView = { center: map.getCenter(), zoom: map.getZoom() };
                 const bounds = map.getBounds();
                 const bbox = `${bounds.getSouth()},${bounds.getWest()},${bounds.getNorth()},${bounds.getEast()}`;
                 const query = `[out:json];way["building"]["addr:housenumber"](${bbox});out center meta;`;
                 try {
                     const response = await fetch('https://overpass-api.de/api/interpreter', {
                         method: 'POST',
-                        body: query
+                        body: query,
+                        signal: ctrl.signal
                     });
                     const data = await response.json();
-                    // Clear previous
-                    addressMarkers.forEach(m => m.remove());
-                    addressMarkers = [];
-                    // Add new
+                    // Новые адреса заменяют прежние одним обновлением источника
+                    const addresses = [];
                     data.elements.slice(0, 100).forEach(element => {  // limit to 100
-                        const lat = element.center.lat;
-                        const lon = element.center.lon;
                         const housenumber = element.tags['addr:housenumber'] || '';
                         const street = element.tags['addr:street'] || '';
                         const address = `${street} ${housenumber}`.trim();
-                        if (address) {
-                            const marker = new maplibregl.Marker({ color: '#888' })
-                                .setLngLat([lon, lat])
-                                .setPopup(new maplibregl.Popup().setHTML(`<b>Адрес:</b><br>${address}`))
-                                .addTo(map);
-                            addressMarkers.push(marker);
-                        }
+                        if (address) addresses.push([[element.center.lon, element.center.lat], { address }]);
                     });
+                    if (ctrl !== addressesCtrl) return;
+                    setPoints('addresses', pointCollection(addresses, a => a));
                 } catch (err) {
+                    if (err.name === 'AbortError') return;
+                    // Неудачный вид не запоминаем: следующее перемещение карты повторит запрос
+                    if (ctrl === addressesCtrl) addressesView = null;
                     console.error('Error fetching addresses:', err);
                 }
             }
 
+            function showAddresses() {
+                addressesShown = true;
+                clearTimeout(addressesTimer);
+                loadAddresses();
+            }
+
+            map.on('moveend', () => {
+                if (!addressesShown || !addressesViewChanged()) return;
+                clearTimeout(addressesTimer);
+                addressesTimer = setTimeout(loadAddresses, ADDRESS_REFETCH_DELAY_MS);
+            });
+
             document.getElementById('showAddressesBtn').addEventListener('click', showAddresses);
 
+            // Прогрев движка синтеза речи: беззвучная фраза снимает задержку первого запуска
+            function primeSpeechEngine() {
+                if (!('speechSynthesis' in window)) return;
+                try {
+                    speechSynthesis.getVoices();
+                    const warmup = new SpeechSynthesisUtterance(' ');
+                    warmup.volume = 0;
+                    warmup.lang = 'ru-RU';
+                    speechSynthesis.speak(warmup);
+                } catch (e) {}
+            }
+
             map.on('load', () => {
+                addPointLayers();
+                primeSpeechEngine();
+                preloadPhrases();
                 console.log("MapLibre готова — всё идеально!");
             });
 
+            // Оформление уведомления задано в CSS, здесь переключается только класс;
+            // новое уведомление продлевает показ, а не скрывается по таймеру предыдущего
+            let notificationTimer = null;
             function showNotification(message, duration) {
-                const notification = document.getElementById('notification');
-                notification.textContent = message;
-                notification.style.display = 'block';
-                notification.style.background = 'linear-gradient(135deg, #667eea, #764ba2)';
-                notification.style.color = 'white';
-                notification.style.border = 'none';
-                notification.style.fontSize = '16px';
-                notification.style.fontWeight = 'bold';
-                setTimeout(() => {
-                    notification.style.display = 'none';
+                notificationEl.textContent = message;
+                notificationEl.classList.add('show');
+                clearTimeout(notificationTimer);
+                notificationTimer = setTimeout(() => {
+                    notificationEl.classList.remove('show');
                 }, duration);
             }
 
             function showVideoAndAudio() {
-                const modal = document.getElementById('videoModal');
-                modal.style.display = 'block';
-                const video = document.getElementById('samovarVideo');
-                video.play();
-                const audio = document.getElementById('bgMusic');
-                audio.src = '/music/julija-chicherina-tu-lu-la.mp3';
-                audio.play();
-
-                // Attach close button event
-                const closeBtn = document.getElementById('closeVideoModal');
-                if (closeBtn) {
-                    closeBtn.addEventListener('click', closeModal);
-                }
+                videoModal.style.display = 'block';
+                samovarVideo.play();
+                bgMusic.src = '/music/julija-chicherina-tu-lu-la.mp3';
+                bgMusic.play();
             }
 
             // Enhanced modal close functionality
-            const modal = document.getElementById('videoModal');
             function closeModal() {
-                const modal = document.getElementById('videoModal');
-                modal.style.display = 'none';
-                const video = document.getElementById('samovarVideo');
-                video.pause();
-                video.currentTime = 0; // Reset video
-                const audio = document.getElementById('bgMusic');
-                audio.pause();
-                audio.currentTime = 0; // Reset audio
+                videoModal.style.display = 'none';
+                samovarVideo.pause();
+                samovarVideo.currentTime = 0; // Reset video
+                bgMusic.pause();
+                bgMusic.currentTime = 0; // Reset audio
             }
+            document.getElementById('closeVideoModal').addEventListener('click', closeModal);
             window.onclick = function(event) {
-                if (event.target == modal) {
+                if (event.target == videoModal) {
                     closeModal();
                 }
             };
 
             // ESC key to close modal
             document.addEventListener('keydown', function(event) {
-                if (event.key === 'Escape' && modal.style.display === 'block') {
+                if (event.key === 'Escape' && videoModal.style.display === 'block') {
                     closeModal();
                 }
             });
@@ -1946,9 +2750,48 @@ try:
     </html>
     """
 
+    # Версии статических файлов по их содержимому: ссылка меняется только при изменении файла
+    STATIC_VERSIONS = {}
+    for static_name in os.listdir(app.static_folder):
+        with open(os.path.join(app.static_folder, static_name), 'rb') as f:
+            STATIC_VERSIONS[static_name] = hashlib.blake2b(f.read(), digest_size=6).hexdigest()
+
+    @app.template_global()
+    def asset_url(filename):
+        return url_for('static', filename=filename, v=STATIC_VERSIONS.get(filename))
+
+    @app.after_request
+    def cache_static_assets(response):
+        if request.path.startswith('/static/') and request.args.get('v'):
+            response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+        return response
+
+    # Блоки, внутри которых пробелы значимы или это код — их не трогаем
+    RAW_BLOCK_RE = re.compile(r'(<(script|style|pre|textarea)\b.*?</\2>)', re.S | re.I)
+    INDENT_RE = re.compile(r'\n\s+')
+
+    def minify_html(html):
+        """Однократно при загрузке убирает отступы и пустые строки вне script/style/pre/textarea"""
+        parts = RAW_BLOCK_RE.split(html)
+        out = []
+        # split отдаёт тройки: текст, целый блок, имя тега
+        for i in range(0, len(parts), 3):
+            out.append(INDENT_RE.sub('\n', parts[i]))
+            if i + 1 < len(parts):
+                out.append(parts[i + 1])
+        return ''.join(out).strip()
+
+    def render_page(template, **context):
+        """Рендер заранее скомпилированного шаблона с контекстом Flask"""
+        app.update_template_context(context)
+        return template.render(context)
+
+    # Шаблоны компилируются один раз при запуске, а не на каждый запрос
+    INDEX_TEMPLATE = app.jinja_env.from_string(minify_html(HTML_TEMPLATE))
+
     @app.route('/')
     def index():
-        return render_template_string(HTML_TEMPLATE)
+        return render_page(INDEX_TEMPLATE)
 
     @app.route('/api/route', methods=['POST'])
     def api_route():
@@ -2003,6 +2846,14 @@ try:
         target_categories = mapping.get(mobility_type, [])
         return any(any(cat.lower() in category.lower() for cat in target_categories) for category in categories)
 
+    def cached_json(payload, seconds=60):
+        """JSON-ответ с Cache-Control и слабым ETag; при совпадении If-None-Match — 304"""
+        body = json.dumps(payload, ensure_ascii=False)
+        resp = Response(body, mimetype='application/json')
+        resp.headers['Cache-Control'] = f'public, max-age={seconds}'
+        resp.set_etag(hashlib.blake2b(body.encode(), digest_size=8).hexdigest(), weak=True)
+        return resp.make_conditional(request)
+
     def clean_address(full_address):
         parts = full_address.split(', ')
         cleaned = []
@@ -2011,38 +2862,50 @@ try:
             if not part:
                 continue
             # Skip postal codes (5+ digits)
-            if part.isdigit() and len(part) >= 5:
-                continue
-            # Skip country
-            if part.lower() in ['россия', 'russia']:
-                continue
-            # Skip regions if too long
-            if len(part) > 20 and any(word in part.lower() for word in ['область', 'край', 'республика']):
-                continue
-            cleaned.append(part)
-            if len(cleaned) >= 3:
-                break
-        return ', '.join(cleaned)
-        parts = full_address.split(', ')
-        cleaned = []
-        for part in parts:
-            part = part.strip()
-            if not part:
-                continue
-            # Skip postal codes (5+ digits)
-            if part.isdigit() and len(part) >= 5:
+            if POSTAL_RE.match(part):
                 continue
             # Skip country
-            if part.lower() in ['россия', 'russia']:
+            part_lower = part.lower()
+            if part_lower in COUNTRY_SET:
                 continue
             # Skip regions if too long
-            if len(part) > 20 and any(word in part.lower() for word in ['область', 'край', 'республика']):
+            if len(part) > 20 and REGION_WORDS.search(part_lower):
                 continue
             cleaned.append(part)
             if len(cleaned) >= 3:
                 break
         return ', '.join(cleaned)
 
+    def fetch_osm_suggestions(query, limit):
+        """Подсказки адресов из Nominatim (OSM)"""
+        # Add Tula if not specified
+        osm_query = query
+        if not any(city in query.lower() for city in ['тула', 'moscow', 'спб', 'екатеринбург', 'санкт-петербург']):
+            osm_query += ", Тула"
+        names = nav_system.osm.suggest(osm_query, limit)
+        return [clean_address(name) for name in names] if names is not None else []
+
+    def parse_bbox(value):
+        """'запад,юг,восток,север' → кортеж float; None, если параметр пуст или некорректен"""
+        try:
+            west, south, east, north = (float(part) for part in value.split(','))
+        except ValueError:
+            return None
+        if west > east or south > north:
+            return None
+        return west, south, east, north
+
+    def merge_osm_suggestions(suggestions, osm_future):
+        """Дополняет подсказки ответом OSM; адреса, уже найденные в БД, не повторяем"""
+        return list(dict.fromkeys(suggestions + osm_future.result()))[:5]
+
+    def stream_suggestions(cache_key, suggestions, osm_future):
+        """NDJSON: локальные подсказки сразу, затем список, дополненный OSM (каждая строка — весь список)"""
+        yield json.dumps(suggestions, ensure_ascii=False) + "\n"
+        suggestions = merge_osm_suggestions(suggestions, osm_future)
+        SUGGEST_CACHE.set(cache_key, suggestions)
+        yield json.dumps(suggestions, ensure_ascii=False) + "\n"
+
     @app.route('/api/suggest_address')
     def api_suggest_address():
         query = request.args.get('q', '').strip()
@@ -2050,6 +2913,11 @@ try:
             return jsonify([])
         original_query = query
         query_lower = query.lower()
+        bbox = parse_bbox(request.args.get('bbox', ''))
+        cache_key = (query_lower, bbox)
+        cached = SUGGEST_CACHE.get(cache_key)
+        if cached is not None:
+            return cached_json(cached, seconds=30)
         suggestions = []
 
         # Search organizations first
@@ -2059,48 +2927,43 @@ try:
                 if len(suggestions) >= 5:
                     break
 
+        osm_future = None
         if len(suggestions) < 5:
-            conn = sqlite3.connect(nav_system.db.db_path)
-            cursor = conn.cursor()
-            # Get from accessibility_objects - prioritize starts with, then contains
-            cursor.execute("SELECT DISTINCT address FROM accessibility_objects WHERE LOWER(address) LIKE ? LIMIT 10", (query_lower + '%',))
-            starts_with = [row[0] for row in cursor.fetchall()]
-            cursor.execute("SELECT DISTINCT address FROM accessibility_objects WHERE LOWER(address) LIKE ? AND LOWER(address) NOT LIKE ? LIMIT 10", ('%' + query_lower + '%', query_lower + '%'))
-            contains = [row[0] for row in cursor.fetchall()]
-            db_addresses = starts_with + contains
-            # Get from user_submissions
-            cursor.execute("SELECT DISTINCT address FROM user_submissions WHERE LOWER(address) LIKE ? LIMIT 10", (query_lower + '%',))
-            starts_with_sub = [row[0] for row in cursor.fetchall()]
-            cursor.execute("SELECT DISTINCT address FROM user_submissions WHERE LOWER(address) LIKE ? AND LOWER(address) NOT LIKE ? LIMIT 10", ('%' + query_lower + '%', query_lower + '%'))
-            contains_sub = [row[0] for row in cursor.fetchall()]
-            db_addresses.extend(starts_with_sub + contains_sub)
-            conn.close()
-            # Remove duplicates while preserving order
-            seen = set()
+            # Адреса из accessibility_objects и user_submissions: сначала дерево префиксов,
+            # затем FTS5-индекс, если совпадений по началу адреса не хватает
+            db_addresses = ADDRESS_TRIE.search(query_lower, 5)
+            if len(suggestions) + len(db_addresses) < 5:
+                # Запрос к OSM не зависит от SQLite — выполняем их параллельно
+                osm_future = SUGGEST_EXECUTOR.submit(fetch_osm_suggestions, original_query, 5 - len(suggestions))
+                db_addresses += nav_system.db.search_addresses(query, 10)
+            # Совпадения с началом адреса — первыми, затем более короткие: порядок ответа детерминирован
+            db_addresses.sort(key=lambda addr: (not addr.lower().startswith(query_lower), len(addr)))
+            if bbox is not None:
+                # Объекты в видимой области карты — первыми
+                db_addresses = nav_system.db.search_addresses(query, 5, bbox) + db_addresses
+            # Remove duplicates while preserving order, stop at 5
+            seen = {}
             for addr in db_addresses:
-                if addr not in seen and len(suggestions) < 5:
-                    suggestions.append(addr)
-                    seen.add(addr)
-
-        if len(suggestions) < 5:
-            # Fallback to OSM - add Tula if not specified
-            osm_query = original_query
-            if not any(city in original_query.lower() for city in ['тула', 'moscow', 'спб', 'екатеринбург', 'санкт-петербург']):
-                osm_query += ", Тула"
-            try:
-                response = requests.get(
-                    f"{nav_system.osm.base_url}/search",
-                    params={"q": osm_query, "format": "json", "limit": 5 - len(suggestions), "countrycodes": "ru"},
-                    headers=nav_system.osm.headers,
-                    timeout=5
-                )
-                response.raise_for_status()
-                data = response.json()
-                osm_addresses = [clean_address(item['display_name']) for item in data]
-                suggestions.extend(osm_addresses)
-            except Exception as e:
-                print(f"Suggest error: {e}")
-        return jsonify(suggestions[:5])
+                if len(suggestions) >= 5:
+                    break
+                if addr in seen:
+                    continue
+                seen[addr] = None
+                suggestions.append(addr)
+
+        if osm_future is not None:
+            if len(suggestions) < 5:
+                if request.args.get('stream'):
+                    # Клиент не ждёт Nominatim: локальные подсказки показываются первой строкой
+                    return Response(stream_suggestions(cache_key, suggestions, osm_future),
+                                    mimetype='application/x-ndjson')
+                # Fallback to OSM
+                suggestions = merge_osm_suggestions(suggestions, osm_future)
+            else:
+                osm_future.cancel()
+        suggestions = suggestions[:5]
+        SUGGEST_CACHE.set(cache_key, suggestions)
+        return cached_json(suggestions, seconds=30)
 
     @app.route('/api/reverse_geocode')
     def api_reverse_geocode():
@@ -2109,328 +2972,263 @@ try:
         if not lat or not lon:
             return jsonify({"error": "Missing lat/lon"})
         try:
-            response = requests.get(
-                f"{nav_system.osm.base_url}/reverse",
-                params={"lat": lat, "lon": lon, "format": "json", "zoom": 18, "addressdetails": 1},
-                headers=nav_system.osm.headers,
-                timeout=5
-            )
-            response.raise_for_status()
-            data = response.json()
-            address = clean_address(data.get('display_name', ''))
-            return jsonify({"address": address})
-        except Exception as e:
-            print(f"Reverse geocode error: {e}")
+            address = nav_system.osm.reverse_geocode(float(lat), float(lon))
+        except ValueError:
+            address = None
+        if address is None:
             return jsonify({"error": "Reverse geocoding failed"})
+        return cached_json({"address": clean_address(address)}, seconds=REVERSE_GEOCODE_MAX_AGE)
 
-    @app.route('/submit')
-    def submit_page():
-        return render_template_string("""
-        <!DOCTYPE html>
-        <html lang="ru">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>Добавить объект доступности</title>
-            <style>
-                * { margin: 0; padding: 0; box-sizing: border-box; }
-                body {
-                    font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-                    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                    min-height: 100vh;
-                    padding: 20px;
-                }
-                .container {
-                    max-width: 800px;
-                    margin: 0 auto;
-                    background: white;
-                    border-radius: 20px;
-                    box-shadow: 0 20px 60px rgba(0,0,0,0.3);
-                    overflow: hidden;
-                }
-                .header {
-                    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                    color: white;
-                    padding: 30px;
-                    text-align: center;
-                }
-                .header h1 { font-size: 2.5em; margin-bottom: 10px; }
-                .header p { font-size: 1.2em; opacity: 0.9; }
-                .header .admin-links { margin-top: 20px; }
-                .header .admin-links a { color: white; margin: 0 10px; text-decoration: none; }
-                .header .admin-links a[href="/admin/districts"] { background: rgba(255,255,255,0.2); padding: 5px 10px; border-radius: 5px; }
-                .header .admin-links a[href="/admin/districts"] { background: rgba(255,255,255,0.2); padding: 5px 10px; border-radius: 5px; }
-                .content {
-                    padding: 30px;
-                }
-                .form-group {
-                    margin-bottom: 20px;
-                }
-                .form-group label {
-                    display: block;
-                    margin-bottom: 8px;
-                    font-weight: 600;
-                    color: #333;
-                }
-                .form-group input, .form-group select, .form-group textarea {
-                    width: 100%;
-                    padding: 12px;
-                    border: 2px solid #e0e0e0;
-                    border-radius: 8px;
-                    font-size: 1em;
-                    transition: border-color 0.3s;
-                }
-                .form-group input:focus, .form-group select:focus, .form-group textarea:focus {
-                    outline: none;
-                    border-color: #667eea;
-                }
-                #routeForm {
-                    display: flex;
-                    flex-direction: column;
-                    gap: 15px;
-                }
-                .btn {
-                    width: auto;
-                    padding: 15px;
-                    border: none;
-                    border-radius: 8px;
-                    font-size: 1em;
-                    font-weight: 600;
-                    cursor: pointer;
-                    transition: all 0.3s;
-                    white-space: nowrap;
-                    overflow: hidden;
-                    text-overflow: ellipsis;
-                    flex: 1;
-                }
-                .button-row {
-                    display: flex;
-                    gap: 10px;
-                    flex-wrap: wrap;
-                }
-                .btn-primary {
-                    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                    color: white;
-                }
-                .btn-primary:hover {
-                    transform: translateY(-2px);
-                    box-shadow: 0 5px 15px rgba(102, 126, 234, 0.4);
-                }
-                .btn-secondary {
-                    background: #f0f0f0;
-                    color: #333;
-                }
-                .btn-secondary:hover {
-                    background: #e0e0e0;
-                }
-                .accessibility-buttons { margin-top: 20px; }
-                .btn-accessibility {
-                    background: #667eea;
-                    color: white;
-                    border: 1px solid #667eea;
-                    padding: 10px 15px;
-                    border-radius: 6px;
-                    font-size: 0.9em;
-                    cursor: pointer;
-                    margin: 0 5px;
-                    transition: all 0.3s;
-                }
-                .btn-accessibility:hover {
-                    background: #5a67d8;
-                }
-                .high-contrast {
-                    background: #000 !important;
-                    color: #fff !important;
-                }
-                .high-contrast .container {
-                    background: #111 !important;
-                }
-                .high-contrast .form-group label {
-                    color: #fff !important;
-                }
-                .high-contrast input, .high-contrast select, .high-contrast textarea {
-                    background: #333 !important;
-                    color: #fff !important;
-                    border-color: #fff !important;
-                }
-                .high-contrast .btn {
-                    background: #fff !important;
-                    color: #000 !important;
-                }
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>♿ Добавить объект доступности</h1>
-                    <p>Помогите сделать город доступнее</p>
-                    <div class="accessibility-buttons">
-                        <button id="voiceBtn" class="btn-accessibility">🔊 Голосовое сопровождение</button>
-                        <button id="contrastBtn" class="btn-accessibility">👓 Режим для слабовидящих</button>
-                    </div>
-                </div>
-                <div class="content">
-                    <form action="/api/submit" method="post" enctype="multipart/form-data">
-                        <div class="form-group">
-                            <label>Тип объекта:</label>
-                            <select name="feature_type" required title="Выберите тип объекта доступности">
-                                <option value="пандус_стационарный">Пандус стационарный</option>
-                                <option value="пандус_откидной">Пандус откидной</option>
-                                <option value="лифт">Лифт</option>
-                                <option value="тактильная_плитка_направляющая">Тактильная плитка направляющая</option>
-                                <option value="светофор_звуковой">Звуковой светофор</option>
-                                <option value="поручни">Поручни</option>
-                                <option value="понижение_бордюра">Понижение бордюра</option>
-                            </select>
-                        </div>
-                        <div class="form-group">
-                            <label>Описание:</label>
-                            <textarea name="description" required title="Опишите объект доступности подробно"></textarea>
-                        </div>
-                        <div class="form-group">
-                            <label>Адрес:</label>
-                            <input type="text" name="address" required title="Введите полный адрес объекта доступности">
-                        </div>
-                        <div class="form-group">
-                            <label>Фото:</label>
-                            <input type="file" name="photo" accept="image/*" required title="Загрузите фото объекта (изображение)">
-                        </div>
-                        <div class="button-row">
-                        <button type="submit" class="btn btn-primary">Отправить на проверку</button>
-                        <a href="/" class="btn btn-secondary">Назад</a>
-                        </div>
-                    </form>
+    SUBMIT_HTML = """
+    <!DOCTYPE html>
+    <html lang="ru">
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>Добавить объект доступности</title>
+        <link rel="stylesheet" href="{{ asset_url('style.css') }}">
+        <style>
+            .container {
+                max-width: 800px;
+            }
+            .header .admin-links { margin-top: 20px; }
+            .header .admin-links a { color: white; margin: 0 10px; text-decoration: none; }
+            .header .admin-links a[href="/admin/districts"] { background: rgba(255,255,255,0.2); padding: 5px 10px; border-radius: 5px; }
+            .header .admin-links a[href="/admin/districts"] { background: rgba(255,255,255,0.2); padding: 5px 10px; border-radius: 5px; }
+            .content {
+                padding: 30px;
+            }
+            #submitSuggestions {
+                position: absolute; background: white; border: 1px solid #ccc; max-height: 200px;
+                overflow-y: auto; z-index: 1000; width: 100%; box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+            }
+            #submitSuggestions div { padding: 8px; cursor: pointer; border-bottom: 1px solid #eee; }
+            #submitSuggestions div.active { background: #667eea; color: white; }
+            #routeForm {
+                display: flex;
+                flex-direction: column;
+                gap: 15px;
+            }
+            .btn {
+                width: auto;
+                padding: 15px;
+                border: none;
+                border-radius: 8px;
+                font-size: 1em;
+                font-weight: 600;
+                cursor: pointer;
+                transition: all 0.3s;
+                white-space: nowrap;
+                overflow: hidden;
+                text-overflow: ellipsis;
+                flex: 1;
+            }
+            .btn-accessibility {
+                background: #667eea;
+                color: white;
+                border: 1px solid #667eea;
+                padding: 10px 15px;
+                border-radius: 6px;
+                font-size: 0.9em;
+                cursor: pointer;
+                margin: 0 5px;
+                transition: all 0.3s;
+            }
+            .btn-accessibility:hover {
+                background: #5a67d8;
+            }
+            .high-contrast .container {
+                background: #111 !important;
+            }
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h1>♿ Добавить объект доступности</h1>
+                <p>Помогите сделать город доступнее</p>
+                <div class="accessibility-buttons">
+                    <button id="voiceBtn" class="btn-accessibility">🔊 Голосовое сопровождение</button>
+                    <button id="contrastBtn" class="btn-accessibility">👓 Режим для слабовидящих</button>
                 </div>
             </div>
-        </body>
-        <script>
-            let submitSuggestionBox = document.createElement('div');
-            submitSuggestionBox.id = 'submitSuggestions';
-            submitSuggestionBox.style.cssText = `position: absolute; background: white; border: 1px solid #ccc; max-height: 200px; overflow-y: auto; z-index: 1000; display: none; width: 100%; box-shadow: 0 2px 4px rgba(0,0,0,0.1);`;
-            document.querySelector('input[name="address"]').parentNode.style.position = 'relative';
-            document.querySelector('input[name="address"]').parentNode.appendChild(submitSuggestionBox);
-
-            let submitSelectedIndex = -1;
-
-            function updateSubmitSelection() {
-                const items = submitSuggestionBox.children;
-                for (let i = 0; i < items.length; i++) {
-                    items[i].style.background = i === submitSelectedIndex ? '#667eea' : 'white';
-                    items[i].style.color = i === submitSelectedIndex ? 'white' : 'black';
-                }
-            }
-
-            document.querySelector('input[name="address"]').addEventListener('input', async e => {
-                const query = e.target.value;
-                if (query.length < 1) {
-                    submitSuggestionBox.style.display = 'none';
-                    return;
-                }
-                try {
-                    const res = await fetch('/api/suggest_address?q=' + encodeURIComponent(query));
-                    const suggestions = await res.json();
-                    submitSuggestionBox.innerHTML = '';
-                    submitSelectedIndex = -1;
-                    suggestions.forEach((s, index) => {
-                        const div = document.createElement('div');
-                        div.textContent = s;
-                        div.style.cssText = 'padding: 8px; cursor: pointer; border-bottom: 1px solid #eee;';
-                        div.addEventListener('click', () => {
-                            e.target.value = s;
-                            submitSuggestionBox.style.display = 'none';
-                        });
-                        div.addEventListener('mouseover', () => {
-                            submitSelectedIndex = index;
-                            updateSubmitSelection();
-                        });
-                        submitSuggestionBox.appendChild(div);
-                    });
-                    submitSuggestionBox.style.display = suggestions.length ? 'block' : 'none';
-                } catch (err) {
-                    submitSuggestionBox.style.display = 'none';
-                }
-            });
+            <div class="content">
+                <form action="/api/submit" method="post" enctype="multipart/form-data">
+                    <div class="form-group">
+                        <label>Тип объекта:</label>
+                        <select name="feature_type" data-voice-label="Тип объекта" required title="Выберите тип объекта доступности">
+                            <option value="пандус_стационарный">Пандус стационарный</option>
+                            <option value="пандус_откидной">Пандус откидной</option>
+                            <option value="лифт">Лифт</option>
+                            <option value="тактильная_плитка_направляющая">Тактильная плитка направляющая</option>
+                            <option value="светофор_звуковой">Звуковой светофор</option>
+                            <option value="поручни">Поручни</option>
+                            <option value="понижение_бордюра">Понижение бордюра</option>
+                        </select>
+                    </div>
+                    <div class="form-group">
+                        <label>Описание:</label>
+                        <textarea name="description" data-voice-label="Описание" required title="Опишите объект доступности подробно"></textarea>
+                    </div>
+                    <div class="form-group">
+                        <label>Адрес:</label>
+                        <input type="text" name="address" data-voice-label="Адрес" required title="Введите полный адрес объекта доступности">
+                    </div>
+                    <div class="form-group">
+                        <label>Фото:</label>
+                        <input type="file" name="photo" data-voice-label="Фото" accept="image/*" required title="Загрузите фото объекта (изображение)">
+                    </div>
+                    <div class="button-row">
+                    <button type="submit" class="btn btn-primary">Отправить на проверку</button>
+                    <a href="/" class="btn btn-secondary">Назад</a>
+                    </div>
+                </form>
+            </div>
+        </div>
+    </body>
+    <script src="{{ asset_url('app.js') }}"></script>
+    <script>
+        let submitSuggestionBox = document.createElement('div');
+        submitSuggestionBox.id = 'submitSuggestions';
+        submitSuggestionBox.style.display = 'none';
+        document.querySelector('input[name="address"]').parentNode.style.position = 'relative';
+        document.querySelector('input[name="address"]').parentNode.appendChild(submitSuggestionBox);
+
+        let submitSelectedIndex = -1;
+
+        submitSuggestionBox.addEventListener('click', e => {
+            if (e.target.parentNode !== submitSuggestionBox) return;
+            document.querySelector('input[name="address"]').value = e.target.textContent;
+            submitSuggestionBox.style.display = 'none';
+        });
+
+        submitSuggestionBox.addEventListener('mouseover', e => {
+            if (e.target.parentNode !== submitSuggestionBox) return;
+            submitSelectedIndex = Array.prototype.indexOf.call(submitSuggestionBox.children, e.target);
+            updateSubmitSelection();
+        });
+
+        // Выделение переносится классом: меняются только старая и новая строки, а не весь список
+        const submitActiveItems = submitSuggestionBox.getElementsByClassName('active');
+
+        function updateSubmitSelection() {
+            while (submitActiveItems.length) submitActiveItems[0].classList.remove('active');
+            const item = submitSuggestionBox.children[submitSelectedIndex];
+            if (item) item.classList.add('active');
+        }
 
-            document.querySelector('input[name="address"]').addEventListener('keydown', e => {
-                const items = submitSuggestionBox.children;
-                if (submitSuggestionBox.style.display === 'none' || items.length === 0) return;
-                if (e.key === 'ArrowDown') {
-                    e.preventDefault();
-                    submitSelectedIndex = (submitSelectedIndex + 1) % items.length;
-                    updateSubmitSelection();
-                } else if (e.key === 'ArrowUp') {
-                    e.preventDefault();
-                    submitSelectedIndex = submitSelectedIndex <= 0 ? items.length - 1 : submitSelectedIndex - 1;
-                    updateSubmitSelection();
-                } else if (e.key === 'Enter') {
-                    e.preventDefault();
-                    if (submitSelectedIndex >= 0) {
-                        items[submitSelectedIndex].click();
-                    }
-                } else if (e.key === 'Escape') {
-                    submitSuggestionBox.style.display = 'none';
-                    submitSelectedIndex = -1;
-                }
+        const submitSuggester = createSuggester(suggestions => {
+            submitSelectedIndex = -1;
+            const frag = document.createDocumentFragment();
+            suggestions.forEach(s => {
+                const div = document.createElement('div');
+                div.textContent = s;
+                frag.appendChild(div);
             });
+            submitSuggestionBox.replaceChildren(frag);
+            submitSuggestionBox.style.display = suggestions.length ? 'block' : 'none';
+        }, () => {
+            submitSuggestionBox.style.display = 'none';
+        });
+
+        document.querySelector('input[name="address"]').addEventListener('input', e => {
+            const query = e.target.value;
+            if (query.length < 1) {
+                submitSuggester.cancel();
+                submitSuggestionBox.style.display = 'none';
+                return;
+            }
+            submitSuggester.request(query);
+        });
 
-            document.addEventListener('click', (e) => {
-                if (!e.target.closest('input[name="address"]') && !e.target.closest('#submitSuggestions')) {
-                    submitSuggestionBox.style.display = 'none';
-                    submitSelectedIndex = -1;
+        document.querySelector('input[name="address"]').addEventListener('keydown', e => {
+            const items = submitSuggestionBox.children;
+            if (submitSuggestionBox.style.display === 'none' || items.length === 0) return;
+            if (e.key === 'ArrowDown') {
+                e.preventDefault();
+                submitSelectedIndex = (submitSelectedIndex + 1) % items.length;
+                updateSubmitSelection();
+            } else if (e.key === 'ArrowUp') {
+                e.preventDefault();
+                submitSelectedIndex = submitSelectedIndex <= 0 ? items.length - 1 : submitSelectedIndex - 1;
+                updateSubmitSelection();
+            } else if (e.key === 'Enter') {
+                e.preventDefault();
+                if (submitSelectedIndex >= 0) {
+                    items[submitSelectedIndex].click();
                 }
-            });
-
-            // Accessibility features
-            let voiceMode = false;
-            let highContrast = false;
+            } else if (e.key === 'Escape') {
+                submitSuggestionBox.style.display = 'none';
+                submitSelectedIndex = -1;
+            }
+        });
 
-            document.getElementById('voiceBtn').addEventListener('click', () => {
-                voiceMode = !voiceMode;
-                document.getElementById('voiceBtn').textContent = voiceMode ? '🔊 Выключить голос' : '🔊 Голосовое сопровождение';
-            });
+        document.addEventListener('click', (e) => {
+            if (!e.target.closest('input[name="address"]') && !e.target.closest('#submitSuggestions')) {
+                submitSuggestionBox.style.display = 'none';
+                submitSelectedIndex = -1;
+            }
+        });
+
+        // Accessibility features
+        let voiceMode = false;
+        let highContrast = false;
+
+        document.getElementById('voiceBtn').addEventListener('click', () => {
+            voiceMode = !voiceMode;
+            document.getElementById('voiceBtn').textContent = voiceMode ? '🔊 Выключить голос' : '🔊 Голосовое сопровождение';
+        });
+
+        document.getElementById('contrastBtn').addEventListener('click', () => {
+            highContrast = !highContrast;
+            document.body.classList.toggle('high-contrast', highContrast);
+            document.getElementById('contrastBtn').textContent = highContrast ? '👓 Обычный режим' : '👓 Режим для слабовидящих';
+        });
+
+        // Voice announcements for inputs, selects, and buttons: один делегированный listener на событие
+        const speak = 'speechSynthesis' in window ? text => speechSynthesis.speak(makeUtterance(text)) : () => {};
+        const speakField = 'speechSynthesis' in window ? speakLatest : () => {};
+
+        document.addEventListener('focusin', e => {
+            if (!voiceMode) return;
+            const el = e.target;
+            const label = el.dataset.voiceLabel;
+            if (el.matches('input')) {
+                speakField(label || el.placeholder);
+            } else if (el.matches('select')) {
+                speakField(label || 'Выбор');
+            }
+        });
 
-            document.getElementById('contrastBtn').addEventListener('click', () => {
-                highContrast = !highContrast;
-                document.body.classList.toggle('high-contrast', highContrast);
-                document.getElementById('contrastBtn').textContent = highContrast ? '👓 Обычный режим' : '👓 Режим для слабовидящих';
-            });
+        document.addEventListener('change', e => {
+            if (voiceMode && e.target.matches('select')) {
+                speakField('Выбрано: ' + e.target.options[e.target.selectedIndex].text);
+            }
+        });
 
-            // Voice announcements for inputs, selects, and buttons
-            document.querySelectorAll('input').forEach(el => {
-                el.addEventListener('focus', () => {
-                    if (voiceMode && 'speechSynthesis' in window) {
-                        const label = el.previousElementSibling ? el.previousElementSibling.textContent.trim() : el.placeholder;
-                        speechSynthesis.speak(new SpeechSynthesisUtterance(label));
-                    }
-                });
-            });
+        document.addEventListener('click', e => {
+            const button = e.target.closest('button');
+            if (voiceMode && button) {
+                speak(button.textContent.replace(/[^\w\sа-яё]/gi, '').trim());
+            }
+        });
+    </script>
+    </html>
+    """
+    SUBMIT_TEMPLATE = app.jinja_env.from_string(minify_html(SUBMIT_HTML))
 
-            document.querySelectorAll('select').forEach(el => {
-                el.addEventListener('focus', () => {
-                    if (voiceMode && 'speechSynthesis' in window) {
-                        const label = el.previousElementSibling ? el.previousElementSibling.textContent.trim() : 'Выбор';
-                        speechSynthesis.speak(new SpeechSynthesisUtterance(label));
-                    }
-                });
-                el.addEventListener('change', () => {
-                    if (voiceMode && 'speechSynthesis' in window) {
-                        const selected = el.options[el.selectedIndex].text;
-                        speechSynthesis.speak(new SpeechSynthesisUtterance('Выбрано: ' + selected));
-                    }
-                });
-            });
+    @app.route('/submit')
+    def submit_page():
+        return render_page(SUBMIT_TEMPLATE)
 
-            document.querySelectorAll('button').forEach(el => {
-                el.addEventListener('click', () => {
-                    if (voiceMode && 'speechSynthesis' in window) {
-                        const text = el.textContent.replace(/[^\w\sа-яё]/gi, '').trim();
-                        speechSynthesis.speak(new SpeechSynthesisUtterance(text));
-                    }
-                });
-            });
-        </script>
-        </html>
-        """)
+    def write_upload(path, data, submission_id):
+        try:
+            with open(path, 'wb') as f:
+                f.write(data)
+        except OSError:
+            # Заявка не должна ссылаться на файл, которого нет
+            app.logger.exception("Upload save failed for submission %s", submission_id)
+            nav_system.db.clear_submission_photo(submission_id)
 
     @app.route('/api/submit', methods=['POST'])
     def api_submit():
@@ -2438,255 +3236,237 @@ try:
         description = request.form['description']
         address = request.form['address']
         photo = request.files['photo']
+        data = None
         if photo and photo.filename:
-            filename = secure_filename(photo.filename)
-            photo_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            photo.save(photo_path)
+            # Префикс по времени: одинаковые имена файлов не перезаписывают друг друга
+            filename = f"{time.time_ns()}_{secure_filename(photo.filename)}"
+            data = photo.stream.read()
             photo_path = filename  # store relative path
         else:
             photo_path = ""
-        nav_system.db.add_user_submission(feature_type, description, address, photo_path)
+        submission_id = nav_system.db.add_user_submission(feature_type, description, address, photo_path)
+        if data is not None:
+            IO_EXECUTOR.submit(write_upload, os.path.join(app.config['UPLOAD_FOLDER'], filename), data,
+                               submission_id)
+        ADDRESS_TRIE.insert(address)
+        SUGGEST_CACHE.clear()
         return redirect(url_for('submit_page'))
 
-    @app.route('/admin')
-    def admin_page():
-        submissions = nav_system.db.get_pending_submissions()
-        return render_template_string("""
-        <!DOCTYPE html>
-        <html lang="ru">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>Админ панель</title>
-            <style>
-                * { margin: 0; padding: 0; box-sizing: border-box; }
-                body {
-                    font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-                    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                    min-height: 100vh;
-                    padding: 20px;
-                }
-                .container {
-                    max-width: 1200px;
-                    margin: 0 auto;
-                    background: white;
-                    border-radius: 20px;
-                    box-shadow: 0 20px 60px rgba(0,0,0,0.3);
-                    overflow: hidden;
-                }
-                .header {
-                    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                    color: white;
-                    padding: 30px;
-                    text-align: center;
-                }
-                .header h1 { font-size: 2.5em; margin-bottom: 10px; }
-                .header p { font-size: 1.2em; opacity: 0.9; }
-                .content {
-                    padding: 30px;
-                }
-                .submission {
-                    border: 2px solid #f0f0f0;
-                    border-radius: 10px;
-                    padding: 20px;
-                    margin: 20px 0;
-                    background: #fafafa;
-                }
-                .submission h3 {
-                    margin-bottom: 10px;
-                    color: #667eea;
-                }
-                .submission p {
-                    margin: 5px 0;
-                }
-                .submission img {
-                    max-width: 300px;
-                    margin: 10px 0;
-                    border-radius: 8px;
-                }
-                .btn {
-                    padding: 15px 25px;
-                    border: 2px solid;
-                    border-radius: 0;
-                    font-size: 1.1em;
-                    font-weight: 600;
-                    cursor: pointer;
-                    transition: all 0.3s ease;
-                    margin: 8px;
-                    min-width: 140px;
-                    position: relative;
-                    overflow: hidden;
-                    text-transform: uppercase;
-                    letter-spacing: 0.5px;
-                    background: transparent;
-                }
-                .btn-approve {
-                    background: transparent;
-                    color: #10b981;
-                    border-color: #10b981;
-                    box-shadow: 0 4px 15px rgba(16, 185, 129, 0.4);
-                }
-                .btn-approve:hover {
-                    background: #10b981;
-                    color: white;
-                    transform: translateY(-3px) scale(1.05);
-                    box-shadow: 0 8px 25px rgba(16, 185, 129, 0.6);
-                }
-                .btn-reject {
-                    background: transparent;
-                    color: #ef4444;
-                    border-color: #ef4444;
-                    box-shadow: 0 4px 15px rgba(239, 68, 68, 0.4);
-                }
-                .btn-reject:hover {
-                    background: #ef4444;
-                    color: white;
-                    transform: translateY(-3px) scale(1.05);
-                    box-shadow: 0 8px 25px rgba(239, 68, 68, 0.6);
-                }
-                .btn-secondary {
-                    background: transparent;
-                    color: #333;
-                    border-color: #333;
-                    box-shadow: 0 4px 15px rgba(0,0,0,0.1);
-                }
-                .btn-secondary:hover {
-                    background: #333;
-                    color: white;
-                    transform: translateY(-2px) scale(1.02);
-                    box-shadow: 0 6px 20px rgba(0,0,0,0.15);
-                }
-                .no-submissions {
-                    text-align: center;
-                    padding: 50px;
-                    color: #666;
-                }
-                .admin-links {
-                    display: flex;
-                    flex-wrap: wrap;
-                    gap: 10px;
-                    justify-content: center;
-                    margin-top: 20px;
-                }
-                .admin-links a {
-                    color: white;
-                    text-decoration: none;
-                }
-                .btn-accessibility {
-                    background: rgba(255,255,255,0.4);
-                    border: 2px solid white;
-                    color: white;
-                    padding: 10px 15px;
-                    border-radius: 0;
-                    cursor: pointer;
-                    transition: all 0.3s;
-                    font-weight: bold;
-                }
-                .btn-accessibility:hover {
-                    background: rgba(255,255,255,0.6);
-                    transform: translateY(-1px);
-                    box-shadow: 0 4px 8px rgba(0,0,0,0.2);
-                }
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>🔧 Админ панель</h1>
-                    <p>Управление объектами доступности</p>
-                    <div class="admin-links">
-                        <a href="/admin/districts" class="btn-accessibility">Статистика по районам</a>
-                        <a href="/admin/change_password" class="btn-accessibility">Изменить пароль</a>
-                        <a href="/admin/add_admin" class="btn-accessibility">Добавить админа</a>
-                        <a href="/admin/logout" class="btn-accessibility">Выйти</a>
-                    </div>
-                </div>
-                <div class="content">
-                    {% if submissions %}
-                        {% for sub in submissions %}
-                        <div class="submission" data-id="{{ sub[0] }}">
-                            <h3>{{ sub[1].replace('_', ' ').title() }}</h3>
-                            <p><strong>Описание:</strong> {{ sub[2] }}</p>
-                            <p><strong>Адрес:</strong> {{ sub[3] }}</p>
-                            <p><strong>Отправитель:</strong> {{ sub[6] or 'Аноним' }}</p>
-                            {% if sub[4] %}
-                            <img src="/uploads/{{ sub[4] }}" alt="Фото объекта">
-                            {% endif %}
-                            <button class="btn btn-approve" onclick="approve({{ sub[0] }})">✅ Одобрить</button>
-                            <button class="btn btn-reject" onclick="reject({{ sub[0] }})">❌ Отклонить</button>
-                        </div>
-                        {% endfor %}
-                    {% else %}
-                        <div class="no-submissions">
-                            <h2>Нет ожидающих подтверждений</h2>
-                            <p>Все объекты проверены</p>
-                        </div>
-                    {% endif %}
-                    <a href="/" class="btn btn-secondary">Назад к навигации</a>
+    ADMIN_HTML = """
+    <!DOCTYPE html>
+    <html lang="ru">
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>Админ панель</title>
+        <link rel="stylesheet" href="{{ asset_url('admin.css') }}">
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h1>🔧 Админ панель</h1>
+                <p>Управление объектами доступности</p>
+                <div class="admin-links">
+                    <a href="/admin/districts" class="btn-accessibility">Статистика по районам</a>
+                    <a href="/admin/change_password" class="btn-accessibility">Изменить пароль</a>
+                    <a href="/admin/add_admin" class="btn-accessibility">Добавить админа</a>
+                    <a href="/admin/logout" class="btn-accessibility">Выйти</a>
                 </div>
             </div>
-            <script>
-                function approve(id) {
-                    fetch('/api/approve/' + id, { method: 'POST' })
-                        .then(response => {
-                            if (response.ok) {
-                                removeSubmission(id);
-                            } else {
-                                alert('Ошибка при одобрении');
-                            }
-                        });
+            <div class="content">
+                {% if submissions %}
+                    {% for sub in submissions %}
+                    <div class="submission" id="sub-{{ sub.id }}">
+                        <h3>{{ sub.title }}</h3>
+                        <p><strong>Описание:</strong> {{ sub.description }}</p>
+                        <p><strong>Адрес:</strong> {{ sub.address }}</p>
+                        <p><strong>Отправитель:</strong> {{ sub.sender }}</p>
+                        {% if sub.photo %}
+                        <img src="/uploads/{{ sub.photo }}?v={{ sub.id }}" alt="Фото объекта">
+                        {% endif %}
+                        <button class="btn btn-approve" data-action="approve" data-id="{{ sub.id }}">✅ Одобрить</button>
+                        <button class="btn btn-reject" data-action="reject" data-id="{{ sub.id }}">❌ Отклонить</button>
+                    </div>
+                    {% endfor %}
+                {% else %}
+                    <div class="no-submissions">
+                        <h2>Нет ожидающих подтверждений</h2>
+                        <p>Все объекты проверены</p>
+                    </div>
+                {% endif %}
+                <a href="/" class="btn btn-secondary">Назад к навигации</a>
+            </div>
+        </div>
+        <script>
+            // Живая коллекция: длина обновляется сама при удалении заявок
+            const liveSubs = document.getElementsByClassName('submission');
+
+            // Один делегированный обработчик кнопок одобрения/отклонения для всех заявок
+            document.querySelector('.content').addEventListener('click', e => {
+                const button = e.target.closest('button[data-action]');
+                if (!button) return;
+                if (button.dataset.action === 'approve') {
+                    approve(button.dataset.id);
+                } else if (button.dataset.action === 'reject') {
+                    reject(button.dataset.id);
                 }
-                function reject(id) {
-                    if (confirm('Отклонить объект?')) {
-                        fetch('/api/reject/' + id, { method: 'POST' })
-                            .then(response => {
-                                if (response.ok) {
-                                    removeSubmission(id);
-                                } else {
-                                    alert('Ошибка при отклонении');
-                                }
-                            });
-                        }
-                    }
-                function removeSubmission(id) {
-                    const submission = document.querySelector(`[data-id="${id}"]`);
-                    if (submission) {
-                        submission.remove();
-                        // Check if no submissions left
-                        const submissions = document.querySelectorAll('.submission');
-                        if (submissions.length === 0) {
-                            document.querySelector('.content').innerHTML = `
-                                <div class="no-submissions">
-                                    <h2>Нет ожидающих подтверждений</h2>
-                                    <p>Все объекты проверены</p>
-                                </div>
-                                <a href="/" class="btn btn-secondary">Назад к навигации</a>
-                            `;
+            });
+
+            // Одобрения и отклонения, набранные за короткое окно, отправляются одним запросом
+            const BATCH_DELAY = 50;
+            const pendingIds = { approve: [], reject: [] };
+            const batchTimers = {};
+            const batchErrors = { approve: 'Ошибка при одобрении', reject: 'Ошибка при отклонении' };
+
+            function approve(id) {
+                queueAction('approve', id);
+            }
+            function reject(id) {
+                if (confirm('Отклонить объект?')) {
+                    queueAction('reject', id);
+                }
+            }
+            function queueAction(action, id) {
+                pendingIds[action].push(id);
+                clearTimeout(batchTimers[action]);
+                batchTimers[action] = setTimeout(() => flushAction(action), BATCH_DELAY);
+            }
+            function flushAction(action) {
+                const ids = pendingIds[action];
+                pendingIds[action] = [];
+                fetch('/api/' + action + '_bulk', {
+                    method: 'POST',
+                    keepalive: true,
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ ids: ids })
+                })
+                    .then(response => {
+                        if (response.ok) {
+                            ids.forEach(removeSubmission);
+                        } else {
+                            alert(batchErrors[action]);
                         }
+                    });
+            }
+            // Не потерять набранную пачку, если админ уходит со страницы до её отправки
+            window.addEventListener('pagehide', () => {
+                for (const action in pendingIds) {
+                    if (!pendingIds[action].length) continue;
+                    clearTimeout(batchTimers[action]);
+                    const body = new Blob([JSON.stringify({ ids: pendingIds[action] })], { type: 'application/json' });
+                    navigator.sendBeacon('/api/' + action + '_bulk', body);
+                    pendingIds[action] = [];
+                }
+            });
+            function removeSubmission(id) {
+                const submission = document.getElementById('sub-' + id);
+                if (submission) {
+                    submission.remove();
+                    // Check if no submissions left
+                    if (liveSubs.length === 0) {
+                        document.querySelector('.content').innerHTML = `
+                            <div class="no-submissions">
+                                <h2>Нет ожидающих подтверждений</h2>
+                                <p>Все объекты проверены</p>
+                            </div>
+                            <a href="/" class="btn btn-secondary">Назад к навигации</a>
+                        `;
                     }
                 }
-            </script>
-        </body>
-        </html>
-        """, submissions=submissions)
+            }
+        </script>
+    </body>
+    </html>
+    """
+    ADMIN_TEMPLATE = app.jinja_env.from_string(minify_html(ADMIN_HTML))
+
+    @app.route('/admin')
+    def admin_page():
+        # Поля строки: id, feature_type, description, address, photo_path, latitude, longitude, submitted_by, ...
+        submissions = [{
+            "id": sub[0],
+            "title": sub[1].replace('_', ' ').title(),
+            "description": sub[2],
+            "address": sub[3],
+            "photo": sub[4],
+            "sender": sub[7] or 'Аноним'
+        } for sub in nav_system.db.get_pending_submissions()]
+        return render_page(ADMIN_TEMPLATE, submissions=submissions)
 
     @app.route('/api/approve/<int:submission_id>', methods=['POST'])
     def api_approve(submission_id):
         nav_system.db.approve_submission(submission_id)
         return '', 200
 
+    def bulk_submission_ids():
+        """id заявок из тела {"ids": [...]} пакетного запроса; None, если тело некорректно"""
+        data = request.get_json(silent=True)
+        ids = data.get('ids') if isinstance(data, dict) else None
+        if not isinstance(ids, list) or any(isinstance(i, bool) for i in ids):
+            return None
+        try:
+            return [int(i) for i in ids]
+        except (TypeError, ValueError):
+            return None
+
+    @app.route('/api/approve_bulk', methods=['POST'])
+    def api_approve_bulk():
+        if not session.get('admin'):
+            return jsonify({"error": "Unauthorized"}), 403
+        ids = bulk_submission_ids()
+        if ids is None:
+            return jsonify({"error": "Expected {\"ids\": [int, ...]}"}), 400
+        try:
+            nav_system.db.approve_submissions(ids)
+        except sqlite3.OperationalError as e:
+            return jsonify({"error": "Database locked, try again"}), 500
+        return '', 200
+
+    # Тексты горячих запросов админки: одинаковая строка — попадание в кэш подготовленных выражений
+    SQL_REJECT_SUBMISSION = "UPDATE user_submissions SET status = 'rejected' WHERE id = ?"
+    SQL_SELECT_ADMIN = "SELECT password, must_change_password FROM admins WHERE username = ?"
+
+    def get_db():
+        """Одно соединение с БД на запрос, закрывается в close_db"""
+        db = g.get('db')
+        if db is None:
+            db = g.db = sqlite3.connect(nav_system.db.db_path, timeout=10, cached_statements=256)
+            for pragma in CONNECTION_PRAGMAS:
+                db.execute(pragma)
+        return db
+
+    @app.teardown_appcontext
+    def close_db(exc):
+        db = g.pop('db', None)
+        if db is not None:
+            db.close()
+
     @app.route('/api/reject/<int:submission_id>', methods=['POST'])
     def api_reject(submission_id):
         try:
-            conn = sqlite3.connect(nav_system.db.db_path, timeout=10)
+            conn = get_db()
             cursor = conn.cursor()
-            cursor.execute("UPDATE user_submissions SET status = 'rejected' WHERE id = ?", (submission_id,))
+            cursor.execute(SQL_REJECT_SUBMISSION, (submission_id,))
+            conn.commit()
+        except sqlite3.OperationalError as e:
+            return jsonify({"error": "Database locked, try again"}), 500
+        return '', 200
+
+    @app.route('/api/reject_bulk', methods=['POST'])
+    def api_reject_bulk():
+        if not session.get('admin'):
+            return jsonify({"error": "Unauthorized"}), 403
+        ids = bulk_submission_ids()
+        if ids is None:
+            return jsonify({"error": "Expected {\"ids\": [int, ...]}"}), 400
+        ids = [(i,) for i in ids]
+        try:
+            conn = get_db()
+            # Все отклонения одной транзакцией — один commit вместо N
+            conn.executemany(SQL_REJECT_SUBMISSION, ids)
             conn.commit()
         except sqlite3.OperationalError as e:
             return jsonify({"error": "Database locked, try again"}), 500
-        finally:
-            if 'conn' in locals():
-                conn.close()
         return '', 200
 
     @app.before_request
@@ -2695,113 +3475,104 @@ try:
             if not session.get('admin'):
                 return redirect(url_for('admin_login'))
 
+    # Общие стили форм входа/смены пароля/добавления админа
+    ADMIN_FORM_CSS = app.static_url_path + '/admin_form.css?v=' + STATIC_VERSIONS['admin_form.css']
+
+    def split_flash_page(html):
+        """Страница без Jinja: готовые байты до и после места для flash-сообщения"""
+        html = minify_html(html.replace('{admin_form_css}', ADMIN_FORM_CSS))
+        before, after = html.split('<!--flash-->')
+        return before.encode('utf-8'), after.encode('utf-8')
+
+    def flash_page(page, flashes):
+        before, after = page
+        flash_html = b''
+        if flashes:
+            flash_html = b'<div class="flash">' + str(escape(flashes[0])).encode('utf-8') + b'</div>'
+        return Response(before + flash_html + after, mimetype='text/html')
+
+    ADMIN_LOGIN_HTML = """
+    <!DOCTYPE html>
+    <html lang="ru">
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>Вход в админ панель</title>
+        <link rel="stylesheet" href="{admin_form_css}">
+    </head>
+    <body>
+        <div class="container">
+            <h1 style="text-align: center; margin-bottom: 30px;">Вход в админ панель</h1>
+            <!--flash-->
+            <form method="post">
+                <div class="form-group">
+                    <label for="username">Имя пользователя:</label>
+                    <input type="text" id="username" name="username" required>
+                </div>
+                <div class="form-group">
+                    <label for="password">Пароль:</label>
+                    <input type="password" id="password" name="password" required>
+                </div>
+                <button type="submit" class="btn">Войти</button>
+            </form>
+        </div>
+    </body>
+    </html>
+    """
+    ADMIN_LOGIN_PAGE = split_flash_page(ADMIN_LOGIN_HTML)
+
     @app.route('/admin/login', methods=['GET', 'POST'])
     def admin_login():
         if request.method == 'POST':
             username = request.form['username']
             password = request.form['password']
-            conn = sqlite3.connect(nav_system.db.db_path)
+            conn = get_db()
             cursor = conn.cursor()
-            cursor.execute("SELECT password, must_change_password FROM admins WHERE username = ?", (username,))
+            cursor.execute(SQL_SELECT_ADMIN, (username,))
             row = cursor.fetchone()
-            conn.close()
-            if row and check_password_hash(row[0], password):
+            if row and verify_password(row[0], password):
+                # Хэши werkzeug и устаревшие параметры Argon2 перехэшируем текущими
+                if password_needs_rehash(row[0]):
+                    cursor.execute("UPDATE admins SET password = ? WHERE username = ?",
+                                   (hash_password(password), username))
+                    conn.commit()
                 session['admin'] = username
                 if row[1]:
                     return redirect(url_for('change_password'))
                 return redirect(url_for('admin_page'))
             flash('Неверные учетные данные')
-        return render_template_string("""
-        <!DOCTYPE html>
-        <html lang="ru">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>Вход в админ панель</title>
-            <style>
-                * { margin: 0; padding: 0; box-sizing: border-box; }
-                body {
-                    font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-                    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                    min-height: 100vh;
-                    display: flex;
-                    align-items: center;
-                    justify-content: center;
-                }
-                .container {
-                    background: white;
-                    border-radius: 20px;
-                    box-shadow: 0 20px 60px rgba(0,0,0,0.3);
-                    padding: 40px;
-                    width: 100%;
-                    max-width: 400px;
-                }
-                .form-group {
-                    margin-bottom: 20px;
-                }
-                .form-group label {
-                    display: block;
-                    margin-bottom: 8px;
-                    font-weight: 600;
-                    color: #333;
-                }
-                .form-group input {
-                    width: 100%;
-                    padding: 12px;
-                    border: 2px solid #e0e0e0;
-                    border-radius: 8px;
-                    font-size: 1em;
-                    transition: border-color 0.3s;
-                }
-                .form-group input:focus {
-                    outline: none;
-                    border-color: #667eea;
-                }
-                .btn {
-                    width: 100%;
-                    padding: 15px;
-                    border: none;
-                    border-radius: 8px;
-                    font-size: 1.1em;
-                    font-weight: 600;
-                    cursor: pointer;
-                    transition: all 0.3s;
-                    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                    color: white;
-                }
-                .btn:hover {
-                    transform: translateY(-2px);
-                    box-shadow: 0 5px 15px rgba(102, 126, 234, 0.4);
-                }
-                .flash {
-                    color: red;
-                    margin-bottom: 20px;
-                }
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h1 style="text-align: center; margin-bottom: 30px;">Вход в админ панель</h1>
-                {% with messages = get_flashed_messages() %}
-                    {% if messages %}
-                        <div class="flash">{{ messages[0] }}</div>
-                    {% endif %}
-                {% endwith %}
-                <form method="post">
-                    <div class="form-group">
-                        <label for="username">Имя пользователя:</label>
-                        <input type="text" id="username" name="username" required>
-                    </div>
-                    <div class="form-group">
-                        <label for="password">Пароль:</label>
-                        <input type="password" id="password" name="password" required>
-                    </div>
-                    <button type="submit" class="btn">Войти</button>
-                </form>
-            </div>
-        </body>
-        </html>
-        """)
+        flashes = get_flashed_messages()
+        return flash_page(ADMIN_LOGIN_PAGE, flashes)
+
+    CHANGE_PASSWORD_HTML = """
+    <!DOCTYPE html>
+    <html lang="ru">
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>Изменить пароль</title>
+        <link rel="stylesheet" href="{admin_form_css}">
+    </head>
+    <body>
+        <div class="container">
+            <h1 style="text-align: center; margin-bottom: 30px;">Изменить пароль</h1>
+            <!--flash-->
+            <form method="post">
+                <div class="form-group">
+                    <label for="new_password">Новый пароль:</label>
+                    <input type="password" id="new_password" name="new_password" required>
+                </div>
+                <div class="form-group">
+                    <label for="confirm_password">Подтвердить пароль:</label>
+                    <input type="password" id="confirm_password" name="confirm_password" required>
+                </div>
+                <button type="submit" class="btn">Изменить</button>
+            </form>
+        </div>
+    </body>
+    </html>
+    """
+    CHANGE_PASSWORD_PAGE = split_flash_page(CHANGE_PASSWORD_HTML)
 
     @app.route('/admin/change_password', methods=['GET', 'POST'])
     def change_password():
@@ -2813,105 +3584,45 @@ try:
             if new_password != confirm_password:
                 flash('Пароли не совпадают')
                 return redirect(request.url)
-            conn = sqlite3.connect(nav_system.db.db_path)
+            conn = get_db()
             cursor = conn.cursor()
             cursor.execute("UPDATE admins SET password = ?, must_change_password = 0 WHERE username = ?",
-                           (generate_password_hash(new_password), session['admin']))
+                           (hash_password(new_password), session['admin']))
             conn.commit()
-            conn.close()
             flash('Пароль изменен')
             return redirect(url_for('admin_page'))
-        return render_template_string("""
-        <!DOCTYPE html>
-        <html lang="ru">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>Изменить пароль</title>
-            <style>
-                * { margin: 0; padding: 0; box-sizing: border-box; }
-                body {
-                    font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-                    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                    min-height: 100vh;
-                    display: flex;
-                    align-items: center;
-                    justify-content: center;
-                }
-                .container {
-                    background: white;
-                    border-radius: 20px;
-                    box-shadow: 0 20px 60px rgba(0,0,0,0.3);
-                    padding: 40px;
-                    width: 100%;
-                    max-width: 400px;
-                }
-                .form-group {
-                    margin-bottom: 20px;
-                }
-                .form-group label {
-                    display: block;
-                    margin-bottom: 8px;
-                    font-weight: 600;
-                    color: #333;
-                }
-                .form-group input {
-                    width: 100%;
-                    padding: 12px;
-                    border: 2px solid #e0e0e0;
-                    border-radius: 8px;
-                    font-size: 1em;
-                    transition: border-color 0.3s;
-                }
-                .form-group input:focus {
-                    outline: none;
-                    border-color: #667eea;
-                }
-                .btn {
-                    width: 100%;
-                    padding: 15px;
-                    border: none;
-                    border-radius: 8px;
-                    font-size: 1.1em;
-                    font-weight: 600;
-                    cursor: pointer;
-                    transition: all 0.3s;
-                    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                    color: white;
-                }
-                .btn:hover {
-                    transform: translateY(-2px);
-                    box-shadow: 0 5px 15px rgba(102, 126, 234, 0.4);
-                }
-                .flash {
-                    color: red;
-                    margin-bottom: 20px;
-                }
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h1 style="text-align: center; margin-bottom: 30px;">Изменить пароль</h1>
-                {% with messages = get_flashed_messages() %}
-                    {% if messages %}
-                        <div class="flash">{{ messages[0] }}</div>
-                    {% endif %}
-                {% endwith %}
-                <form method="post">
-                    <div class="form-group">
-                        <label for="new_password">Новый пароль:</label>
-                        <input type="password" id="new_password" name="new_password" required>
-                    </div>
-                    <div class="form-group">
-                        <label for="confirm_password">Подтвердить пароль:</label>
-                        <input type="password" id="confirm_password" name="confirm_password" required>
-                    </div>
-                    <button type="submit" class="btn">Изменить</button>
-                </form>
-            </div>
-        </body>
-        </html>
-        """)
+        flashes = get_flashed_messages()
+        return flash_page(CHANGE_PASSWORD_PAGE, flashes)
+
+    ADD_ADMIN_HTML = """
+    <!DOCTYPE html>
+    <html lang="ru">
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>Добавить админа</title>
+        <link rel="stylesheet" href="{admin_form_css}">
+    </head>
+    <body>
+        <div class="container">
+            <h1 style="text-align: center; margin-bottom: 30px;">Добавить админа</h1>
+            <!--flash-->
+            <form method="post">
+                <div class="form-group">
+                    <label for="username">Имя пользователя:</label>
+                    <input type="text" id="username" name="username" required>
+                </div>
+                <div class="form-group">
+                    <label for="password">Пароль:</label>
+                    <input type="password" id="password" name="password" required>
+                </div>
+                <button type="submit" class="btn">Добавить</button>
+            </form>
+        </div>
+    </body>
+    </html>
+    """
+    ADD_ADMIN_PAGE = split_flash_page(ADD_ADMIN_HTML)
 
     @app.route('/admin/add_admin', methods=['GET', 'POST'])
     def add_admin():
@@ -2920,108 +3631,18 @@ try:
         if request.method == 'POST':
             username = request.form['username']
             password = request.form['password']
-            conn = sqlite3.connect(nav_system.db.db_path)
+            conn = get_db()
             cursor = conn.cursor()
             try:
                 cursor.execute("INSERT INTO admins (username, password, must_change_password) VALUES (?, ?, ?)",
-                               (username, generate_password_hash(password), 0))
+                               (username, hash_password(password), 0))
                 conn.commit()
                 flash('Админ добавлен')
             except sqlite3.IntegrityError:
                 flash('Имя пользователя уже существует')
-            conn.close()
             return redirect(url_for('admin_page'))
-        return render_template_string("""
-        <!DOCTYPE html>
-        <html lang="ru">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>Добавить админа</title>
-            <style>
-                * { margin: 0; padding: 0; box-sizing: border-box; }
-                body {
-                    font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-                    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                    min-height: 100vh;
-                    display: flex;
-                    align-items: center;
-                    justify-content: center;
-                }
-                .container {
-                    background: white;
-                    border-radius: 20px;
-                    box-shadow: 0 20px 60px rgba(0,0,0,0.3);
-                    padding: 40px;
-                    width: 100%;
-                    max-width: 400px;
-                }
-                .form-group {
-                    margin-bottom: 20px;
-                }
-                .form-group label {
-                    display: block;
-                    margin-bottom: 8px;
-                    font-weight: 600;
-                    color: #333;
-                }
-                .form-group input {
-                    width: 100%;
-                    padding: 12px;
-                    border: 2px solid #e0e0e0;
-                    border-radius: 8px;
-                    font-size: 1em;
-                    transition: border-color 0.3s;
-                }
-                .form-group input:focus {
-                    outline: none;
-                    border-color: #667eea;
-                }
-                .btn {
-                    width: 100%;
-                    padding: 15px;
-                    border: none;
-                    border-radius: 8px;
-                    font-size: 1.1em;
-                    font-weight: 600;
-                    cursor: pointer;
-                    transition: all 0.3s;
-                    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                    color: white;
-                }
-                .btn:hover {
-                    transform: translateY(-2px);
-                    box-shadow: 0 5px 15px rgba(102, 126, 234, 0.4);
-                }
-                .flash {
-                    color: red;
-                    margin-bottom: 20px;
-                }
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h1 style="text-align: center; margin-bottom: 30px;">Добавить админа</h1>
-                {% with messages = get_flashed_messages() %}
-                    {% if messages %}
-                        <div class="flash">{{ messages[0] }}</div>
-                    {% endif %}
-                {% endwith %}
-                <form method="post">
-                    <div class="form-group">
-                        <label for="username">Имя пользователя:</label>
-                        <input type="text" id="username" name="username" required>
-                    </div>
-                    <div class="form-group">
-                        <label for="password">Пароль:</label>
-                        <input type="password" id="password" name="password" required>
-                    </div>
-                    <button type="submit" class="btn">Добавить</button>
-                </form>
-            </div>
-        </body>
-        </html>
-        """)
+        flashes = get_flashed_messages()
+        return flash_page(ADD_ADMIN_PAGE, flashes)
 
     @app.route('/admin/logout')
     def logout():
@@ -3052,7 +3673,9 @@ try:
 
     @app.route('/uploads/<filename>')
     def uploaded_file(filename):
-        return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+        # Фото не меняются после загрузки; ?v=<id заявки> сбрасывает кэш при повторном имени
+        return send_from_directory(app.config['UPLOAD_FOLDER'], filename,
+                                   conditional=True, etag=True, max_age=31536000)
 
     @app.route('/tula_districts/<filename>')
     def serve_districts(filename):
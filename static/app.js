@@ -0,0 +1,238 @@
+// Общий код главной страницы и страницы /submit: синтез речи и кэш подсказок адресов
+
+// Initialize speech synthesis: голос выбирается один раз и обновляется при загрузке списка голосов
+const EMOJI_RE = /[\u{1F300}-\u{1F64F}\u{1F680}-\u{1F6FF}\u{1F1E0}-\u{1F1FF}\u{2600}-\u{27BF}]/gu;
+let CACHED_RU_VOICE = null;
+
+function updateRussianVoice() {
+    // Попытка выбрать мужской русский голос
+    CACHED_RU_VOICE = speechSynthesis.getVoices().find(v => v.lang.startsWith('ru') && (v.name.includes('Male') || v.name.includes('мужской') || !v.name.includes('Female'))) || null;
+}
+
+if ('speechSynthesis' in window) {
+    speechSynthesis.onvoiceschanged = updateRussianVoice;
+    updateRussianVoice();
+}
+
+// Настройка фразы с более человеческим голосом
+function configureUtterance(utter, text) {
+    // Убираем эмодзи из текста
+    utter.text = text.replace(EMOJI_RE, '');
+    utter.lang = 'ru-RU';
+    utter.rate = 0.9;  // Более естественная скорость
+    utter.pitch = 0.9; // Более низкая высота для мужского голоса
+    utter.volume = 0.9;
+    utter.onend = null;
+    if (CACHED_RU_VOICE) utter.voice = CACHED_RU_VOICE;
+    return utter;
+}
+
+// Пул отзвучавших фраз: объекты переиспользуются вместо создания новых на каждое предложение
+const UTTERANCE_POOL_SIZE = 16;
+const uttPool = [];
+
+function releaseUtterance(utter) {
+    if (uttPool.length < UTTERANCE_POOL_SIZE && !uttPool.includes(utter)) uttPool.push(utter);
+}
+
+function makeUtterance(text) {
+    let utter = uttPool.pop();
+    if (!utter) {
+        utter = new SpeechSynthesisUtterance();
+        utter.addEventListener('end', () => releaseUtterance(utter));
+        utter.addEventListener('error', () => releaseUtterance(utter));
+    }
+    return configureUtterance(utter, text);
+}
+
+// Озвучка при навигации по полям: при быстром Tab звучит только последнее поле,
+// очередь движка не растёт
+const SPEAK_DEBOUNCE_MS = 80;
+let speakTimer = null;
+
+function speakLatest(text) {
+    clearTimeout(speakTimer);
+    speakTimer = setTimeout(() => {
+        speechSynthesis.cancel();
+        speechSynthesis.speak(makeUtterance(text));
+    }, SPEAK_DEBOUNCE_MS);
+}
+
+// Отмена отложенной озвучки поля, чтобы она не прервала начатое сообщение
+function cancelPendingSpeech() {
+    clearTimeout(speakTimer);
+}
+
+// LRU-кэш подсказок (общий для всех полей адреса): ключ — запрос в нижнем регистре
+const SUGGEST_CACHE_SIZE = 50;
+const suggestCache = new Map();
+
+function lruGet(key) {
+    if (!suggestCache.has(key)) return undefined;
+    const value = suggestCache.get(key);
+    suggestCache.delete(key);
+    suggestCache.set(key, value);
+    return value;
+}
+
+function lruSet(key, value) {
+    suggestCache.delete(key);
+    suggestCache.set(key, value);
+    if (suggestCache.size > SUGGEST_CACHE_SIZE) {
+        suggestCache.delete(suggestCache.keys().next().value);
+    }
+}
+
+// Подсказки на сутки сохраняются в localStorage: повторный запрос после перезагрузки страницы мгновенный.
+// Записей не больше SUGGEST_STORAGE_MAX: устаревшие и самые старые удаляются при загрузке
+// и когда лимит превышен, иначе ключи с bbox заполнили бы квоту и запись молча перестала бы работать
+const SUGGEST_STORAGE_TTL_MS = 24 * 60 * 60 * 1000;
+const SUGGEST_STORAGE_MAX = 200;
+const SUGGEST_STORAGE_PREFIX = 'suggest:';
+let suggestStorageCount = 0;
+
+function pruneSuggestStorage(keep) {
+    try {
+        const now = Date.now();
+        const entries = [];
+        for (let i = 0; i < localStorage.length; i++) {
+            const key = localStorage.key(i);
+            if (!key || !key.startsWith(SUGGEST_STORAGE_PREFIX)) continue;
+            let t = 0;
+            try { t = JSON.parse(localStorage.getItem(key)).t || 0; } catch (e) {}
+            entries.push([key, t]);
+        }
+        entries.sort((a, b) => b[1] - a[1]);
+        const stale = entries.filter(([, t], i) => i >= keep || now - t >= SUGGEST_STORAGE_TTL_MS);
+        stale.forEach(([key]) => localStorage.removeItem(key));
+        suggestStorageCount = entries.length - stale.length;
+    } catch (e) {}
+}
+
+pruneSuggestStorage(SUGGEST_STORAGE_MAX);
+
+function storageGet(key) {
+    try {
+        const item = JSON.parse(localStorage.getItem(SUGGEST_STORAGE_PREFIX + key));
+        if (item && Date.now() - item.t < SUGGEST_STORAGE_TTL_MS) return item.v;
+    } catch (e) {}
+    return undefined;
+}
+
+function storageSet(key, value) {
+    const item = JSON.stringify({ t: Date.now(), v: value });
+    try {
+        localStorage.setItem(SUGGEST_STORAGE_PREFIX + key, item);
+    } catch (e) {
+        // Квота занята: освобождаем половину своих записей и пробуем ещё раз
+        pruneSuggestStorage(SUGGEST_STORAGE_MAX / 2);
+        try { localStorage.setItem(SUGGEST_STORAGE_PREFIX + key, item); } catch (e2) { return; }
+    }
+    // С запасом ниже лимита, чтобы очистка не шла на каждой следующей записи
+    if (++suggestStorageCount > SUGGEST_STORAGE_MAX) pruneSuggestStorage(SUGGEST_STORAGE_MAX * 3 / 4);
+}
+
+// Ключ кэша подсказок: запрос в нижнем регистре и, если задана, видимая область карты
+function suggestKey(query, bbox) {
+    const key = query.trim().toLowerCase();
+    return bbox ? `${key}@${bbox}` : key;
+}
+
+// Построчное чтение NDJSON-ответа: onLine вызывается для каждой строки по мере прихода,
+// возвращается последняя строка
+const STREAMING_SUPPORTED = typeof TextDecoderStream !== 'undefined';
+
+async function readNdjson(res, onLine) {
+    const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+    let buf = '';
+    let last;
+    for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buf += value;
+        let nl;
+        while ((nl = buf.indexOf('\n')) >= 0) {
+            const line = buf.slice(0, nl);
+            buf = buf.slice(nl + 1);
+            if (line) onLine(last = JSON.parse(line));
+        }
+    }
+    if (buf.trim()) onLine(last = JSON.parse(buf));
+    return last;
+}
+
+// Подсказки адресов: сначала LRU-кэш и localStorage, затем /api/suggest_address.
+// bbox ('запад,юг,восток,север') поднимает наверх объекты из видимой области карты.
+// С onPartial сервер отдаёт NDJSON: локальные подсказки приходят раньше ответа OSM
+async function fetchSuggestions(query, signal, bbox, onPartial) {
+    const q = query.trim().toLowerCase();
+    const key = suggestKey(q, bbox);
+    const cached = lruGet(key);
+    if (cached) return cached;
+    const stored = storageGet(key);
+    if (stored) {
+        lruSet(key, stored);
+        return stored;
+    }
+    const params = new URLSearchParams({ q });
+    if (bbox) params.set('bbox', bbox);
+    const streaming = onPartial && STREAMING_SUPPORTED;
+    if (streaming) params.set('stream', '1');
+    const res = await fetch(`/api/suggest_address?${params}`, { signal });
+    const suggestions = streaming && (res.headers.get('Content-Type') || '').startsWith('application/x-ndjson')
+        ? await readNdjson(res, onPartial)
+        : await res.json();
+    lruSet(key, suggestions);
+    storageSet(key, suggestions);
+    return suggestions;
+}
+
+// Запросы подсказок для одного поля: ответ из кэша сразу, иначе запрос после паузы в наборе.
+// Пауза подстраивается под темп набора (скользящее среднее интервала между нажатиями),
+// а новый запрос отменяет ещё не завершённый предыдущий
+const SUGGEST_DELAY_MS = 150;
+const SUGGEST_MAX_DELAY_MS = 400;
+
+function createSuggester(onResult, onError, getBbox) {
+    let timer = null;
+    let ctrl = null;
+    let lastInput = 0;
+    let interval = SUGGEST_DELAY_MS;
+
+    function cancel() {
+        clearTimeout(timer);
+        if (ctrl) ctrl.abort();
+        ctrl = null;
+    }
+
+    function request(query) {
+        const now = performance.now();
+        if (lastInput) interval = 0.7 * interval + 0.3 * Math.min(now - lastInput, SUGGEST_MAX_DELAY_MS);
+        lastInput = now;
+        cancel();
+        const bbox = getBbox ? getBbox() : '';
+        const cached = lruGet(suggestKey(query, bbox));
+        if (cached) {
+            onResult(cached);
+            return;
+        }
+        const delay = Math.min(SUGGEST_MAX_DELAY_MS, Math.max(SUGGEST_DELAY_MS, 1.5 * interval));
+        timer = setTimeout(async () => {
+            const current = ctrl = new AbortController();
+            let shown = null;
+            const show = suggestions => {
+                if (current !== ctrl) return;
+                shown = suggestions;
+                onResult(suggestions);
+            };
+            try {
+                const suggestions = await fetchSuggestions(query, current.signal, bbox, show);
+                if (suggestions !== shown) show(suggestions);
+            } catch (err) {
+                if (err.name !== 'AbortError') onError(err);
+            }
+        }, delay);
+    }
+
+    return { request, cancel };
+}
@@ -0,0 +1,14 @@
+try:
+    import osmnx
+except ImportError:  # без osmnx тесты и так пропускают map_creator через importorskip
+    osmnx = None
+
+
+def offline_features_from_place(*args, **kwargs):
+    raise ConnectionError("запросы к OSM в тестах отключены")
+
+
+if osmnx is not None:
+    # Импорт map_creator без db/tula_districts.json запрашивал бы границы районов из OSM:
+    # в тестах запрос сразу падает, и остаются встроенные полигоны TULA_DISTRICTS
+    osmnx.features_from_place = offline_features_from_place
@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+map_creator = pytest.importorskip("map_creator")
+
+
+def border_points():
+    """Вершины районов, середины рёбер и точки на сетке с шагом 0.01° вокруг границ"""
+    points = []
+    for data in map_creator.TULA_DISTRICTS.values():
+        vertices = data["vertices"]
+        points.extend(vertices.tolist())
+        points.extend(((vertices + np.roll(vertices, -1, axis=0)) / 2).tolist())
+        min_lon, min_lat, max_lon, max_lat = data["bbox"]
+        for lon in np.arange(round(min_lon, 2) - 0.01, max_lon + 0.02, 0.01):
+            for lat in np.arange(round(min_lat, 2) - 0.01, max_lat + 0.02, 0.01):
+                points.append((round(float(lon), 2), round(float(lat), 2)))
+    return points
+
+
+def test_single_and_batch_district_lookup_agree_on_borders():
+    points = border_points()
+    lons = np.array([lon for lon, _ in points], dtype=np.float64)
+    lats = np.array([lat for _, lat in points], dtype=np.float64)
+    single = [map_creator.get_district_for_point(lat, lon) for lon, lat in points]
+    assert map_creator.district_labels(lons, lats) == single
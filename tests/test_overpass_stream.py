@@ -0,0 +1,68 @@
+import socket
+
+import pytest
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
+
+map_creator = pytest.importorskip("map_creator")
+
+PARTIAL_BODY = b'{"elements": [{"type": "way", "geometry": [{"lat": 54.19, "lon": 37.61}, {"lat": 54.1'
+
+
+class BrokenStream:
+    """Тело ответа, которое обрывается после первого куска"""
+
+    def __init__(self, error):
+        self.error = error
+        self.sent = False
+        self.decode_content = False
+
+    def read(self, size=-1):
+        if not self.sent:
+            self.sent = True
+            return PARTIAL_BODY
+        raise self.error
+
+
+class BrokenResponse:
+    def __init__(self, error):
+        self.raw = BrokenStream(error)
+        self.error = error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    @property
+    def content(self):
+        raise self.error
+
+    def json(self):
+        raise self.error
+
+
+class BrokenSession:
+    def __init__(self, error):
+        self.error = error
+
+    def post(self, *args, **kwargs):
+        return BrokenResponse(self.error)
+
+
+@pytest.mark.parametrize("error", [
+    ProtocolError("Connection broken: IncompleteRead"),
+    ReadTimeoutError(None, "https://overpass-api.de/api/interpreter", "Read timed out."),
+    socket.timeout("timed out"),
+])
+def test_stream_failing_mid_body_is_not_cached(error):
+    nav = map_creator.AccessibleNavigationSystem.__new__(map_creator.AccessibleNavigationSystem)
+    nav.osm = type("OSM", (), {"session": BrokenSession(error)})()
+    nav._pedestrian_tiles = map_creator.TTLCache(maxsize=16, ttl=60)
+
+    nav._fetch_pedestrian_tiles([(2709, 1880)])
+
+    assert nav._pedestrian_tiles.get((2709, 1880)) is None